@@ -0,0 +1,81 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from src.config import PROFILE_ANCHORS
+from src.drawdown import drawdown
+from src.portfolio import COV_WINDOW, allocate, investable_buckets, rolling_moments
+
+BENCHMARK = "60/40"
+BENCHMARK_WEIGHTS = {"SPY": 0.6, "IEF": 0.4}
+
+
+def benchmark_6040(monthly_ret: pd.DataFrame) -> pd.Series:
+    # SPY/IEF rebalanced monthly
+    return sum(w * monthly_ret.get(t, 0) for t, w in BENCHMARK_WEIGHTS.items()).rename(BENCHMARK)
+
+
+def _known_at(obj, dates: pd.DatetimeIndex):
+    # last non-missing row at or before each date
+    obj = obj.dropna(how="all")
+    return obj.set_axis(pd.DatetimeIndex(obj.index)).reindex(dates, method="ffill")
+
+
+def performance_stats(returns: pd.DataFrame, benchmark: str = BENCHMARK) -> pd.DataFrame:
+    # annualized stats per column of monthly returns; tracking error / information ratio against `benchmark`
+    r = returns.dropna(how="all").fillna(0)
+    if r.empty:
+        return pd.DataFrame(index=returns.columns, columns=["cagr", "vol", "sharpe", "max_drawdown", "tracking_error", "info_ratio"], dtype=float)
+    growth = (1 + r).cumprod()
+    vol = r.std() * np.sqrt(12)
+    active = r.sub(r[benchmark], axis=0)
+    te = (active.std() * np.sqrt(12)).replace(0, np.nan)
+    return pd.DataFrame({
+        "cagr": growth.iloc[-1] ** (12 / len(r)) - 1, "vol": vol, "sharpe": r.mean() * 12 / vol.replace(0, np.nan),
+        "max_drawdown": drawdown(growth).min(), "tracking_error": te, "info_ratio": active.mean() * 12 / te,
+    })
+
+
+def walk_forward(
+    monthly_ret: pd.DataFrame, regime_probs: pd.DataFrame, stress_pct: pd.Series, profiles: list[str] | None = None,
+    flex: float = 0.10, window: int = COV_WINDOW, min_obs: int = 24, cost_bps: float = 0.0,
+) -> dict[str, pd.DataFrame]:
+    # Replays recommend_weights at every month-end t with only what was known at t (trailing `window` returns,
+    # the last regime probabilities and stress percentile at or before t) and holds the weights over month t+1.
+    # Expected returns and the Ledoit-Wolf risk for every window come from one rolling pass shared by all profiles.
+    # Returns weights (decision date x (profile, ticker)), net monthly returns (holding month x profile + 60/40),
+    # one-way turnover against the drifted weights (first month is the initial buy) and per-profile stats.
+    profiles = list(profiles or PROFILE_ANCHORS)
+    buckets = investable_buckets(monthly_ret.columns)
+    tickers = [t for b in buckets for t in b]
+    R = monthly_ret[tickers].dropna(how="any")
+    months = monthly_ret.index
+    pos = months.get_indexer(R.index)
+    rows = np.flatnonzero((np.arange(1, len(R) + 1) >= min_obs) & (pos + 1 < len(months)))
+    decided, held = R.index[rows], months[pos[rows] + 1]
+
+    mean, mean12, risk = rolling_moments(R.to_numpy(dtype=float), window)
+    mu = mean * (1 - 0.5) + mean12 * 0.5
+    # months before the first regime / stress reading fall back like `reco` does: no tilt, stress 0.5
+    probs = _known_at(regime_probs, decided).fillna(0).to_dict("records")
+    stress = (_known_at(stress_pct, decided) / 100).fillna(0.5).to_numpy()
+    nxt = np.nan_to_num(monthly_ret[tickers].to_numpy(dtype=float)[pos[rows] + 1])
+
+    weights, returns, turnover = {}, {}, {}
+    for profile in profiles:
+        anchor = PROFILE_ANCHORS[profile]
+        W = np.array([allocate(mu[k], risk[k], buckets, anchor, probs[i], stress[i], flex) for i, k in enumerate(rows)]).reshape(len(rows), len(tickers))
+        gross = (W * nxt).sum(axis=1)
+        drifted = W * (1 + nxt) / (1 + gross)[:, None]
+        traded = np.abs(W - np.vstack([np.zeros((1, len(tickers))), drifted[:-1]]))
+        turnover[profile] = 0.5 * traded.sum(axis=1)
+        returns[profile] = gross - cost_bps / 1e4 * traded.sum(axis=1)
+        weights[profile] = pd.DataFrame(W, index=decided, columns=tickers)
+
+    returns = pd.DataFrame(returns, index=held).assign(**{BENCHMARK: benchmark_6040(monthly_ret).reindex(held).to_numpy()})
+    turnover = pd.DataFrame(turnover, index=decided)
+    stats = performance_stats(returns)
+    stats["avg_turnover"] = turnover.iloc[1:].mean()
+    return {
+        "weights": pd.concat(weights, axis=1, names=["profile", "ticker"]), "returns": returns.rename_axis("date"),
+        "turnover": turnover.rename_axis("date"), "stats": stats.rename_axis("portfolio"),
+    }
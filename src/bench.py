@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.config import ALLOWED_TICKERS, BENCH_BASELINE_PATH, BENCH_ENGINE_MAX_DRIFT, BENCH_MAX_SLOWDOWN, BENCH_NOISE_FLOOR_SECONDS, BENCH_SERIES, BENCH_YEARS
+from src.features import build_market_features, engine_drift
+from src.macro.composites import build_composites
+from src.macro.regimes import regime_probabilities
+from src.macro.tidy import indicator_table, observation_table
+from src.macro.transforms import apply_transform
+from src.portfolio import BONDS, EQUITY, GOLD, recommend_weights
+from src.regime import _MODELS, infer_regime
+from src.signals import build_signals
+from src.utils import pct_rank
+
+END = pd.Timestamp("2024-12-31")
+COUNTRIES = ["US", "EA", "UK", "JP"]
+PILLARS = ["GROWTH", "INFLATION", "LABOR", "FINANCIAL"]
+# native frequency -> (share of indicators, date rule, transforms cycled through)
+FREQUENCIES = {"D": (0.15, "B", ["zscore_252"]), "M": (0.70, "M", ["yoy", "zscore_36", "zscore_36_inv", "mom"]), "Q": (0.15, "Q", ["yoy"])}
+
+
+def synthetic_prices(n_tickers: int = 25, years: int = 20, seed: int = 0) -> pd.DataFrame:
+    # business-day closes: one market factor plus idiosyncratic noise, investable tickers first, a fifth of the
+    # columns starting late (leading NaN) like recently listed ETFs
+    rng = np.random.default_rng(seed)
+    names = list(dict.fromkeys([*EQUITY, *BONDS, *GOLD, *ALLOWED_TICKERS]))
+    names = (names + [f"SYN{i:03d}" for i in range(max(n_tickers - len(names), 0))])[:n_tickers]
+    dates = pd.bdate_range(end=END, periods=years * 252)
+    beta, vol = rng.uniform(0.2, 1.2, n_tickers), rng.uniform(0.003, 0.015, n_tickers)
+    r = 0.0003 + beta * rng.normal(0, 0.01, (len(dates), 1)) + vol * rng.standard_normal((len(dates), n_tickers))
+    px = 100 * np.cumprod(1 + r, axis=0)
+    late = rng.choice(n_tickers, n_tickers // 5, replace=False)
+    for j, start in zip(late, rng.integers(0, len(dates) // 2, len(late))):
+        px[:start, j] = np.nan
+    return pd.DataFrame(px, index=dates, columns=names)
+
+
+def synthetic_catalog(n_indicators: int = 16, seed: int = 0) -> list[dict]:
+    # catalog entries with the fields the macro layer reads; frequencies mixed per FREQUENCIES
+    rng = np.random.default_rng(seed)
+    freqs = rng.choice(list(FREQUENCIES), n_indicators, p=[v[0] for v in FREQUENCIES.values()])
+    return [{
+        "id": f"syn_{i:03d}", "display_name": f"Synthetic {i}", "source": "SYNTHETIC", "country": COUNTRIES[i % len(COUNTRIES)],
+        "frequency": f, "type": ["HARD", "SOFT"][i // 4 % 2], "timing": ["LEADING", "COINCIDENT", "LAGGING"][i // 8 % 3],
+        "pillar": PILLARS[i // len(COUNTRIES) % len(PILLARS)], "transform": FREQUENCIES[f][2][i % len(FREQUENCIES[f][2])], "weight": 1.0,
+    } for i, f in enumerate(freqs)]
+
+
+def synthetic_series(catalog: list[dict], years: int = 20, seed: int = 0) -> dict[str, pd.Series]:
+    # raw (untransformed) positive levels at each indicator's native frequency
+    rng = np.random.default_rng(seed)
+    out = {}
+    for ind in catalog:
+        dates = pd.date_range(end=END, periods=years * {"D": 252, "M": 12, "Q": 4}[ind["frequency"]], freq=FREQUENCIES[ind["frequency"]][1])
+        out[ind["id"]] = pd.Series(100 * np.exp(np.cumsum(rng.normal(0.001, 0.01, len(dates)))), index=dates)
+    return out
+
+
+def synthetic_macro_tidy(catalog: list[dict], series: dict[str, pd.Series]) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # (obs, dims) as fetch_catalog_data returns them
+    dims = indicator_table(catalog)
+    return observation_table({ind["id"]: apply_transform(series[ind["id"]], ind["transform"]) for ind in catalog}, dims.index), dims
+
+
+def synthetic_regime_features(years: int = 20, seed: int = 0) -> pd.DataFrame:
+    # monthly regime drivers (the macro_df columns) drifting through four persistent growth/inflation states
+    rng = np.random.default_rng(seed)
+    idx = pd.date_range(end=END, periods=years * 12, freq="M")
+    state = np.repeat(rng.integers(0, 4, len(idx) // 18 + 1), 18)[: len(idx)]
+    centers = np.array([[1, -1], [1, 1], [-1, -1], [-1, 1]], dtype=float)[state]
+    out = pd.DataFrame(centers + rng.normal(0, 0.6, (len(idx), 2)), index=idx, columns=["growth", "inflation"])
+    out["real_rates"] = 1 + 0.5 * out["inflation"] + rng.normal(0, 0.3, len(idx))
+    out["slope"] = 0.8 * out["growth"] + rng.normal(0, 0.3, len(idx))
+    out["stress"] = 4 - out["growth"] + rng.normal(0, 0.5, len(idx))
+    return out
+
+
+def _cold_infer_regime(macro_df: pd.DataFrame):
+    # infer_regime with an empty model store, so every run pays for the full fit
+    previous = os.environ.get("CAM_MODEL_STORE")
+    with tempfile.TemporaryDirectory() as store:
+        os.environ["CAM_MODEL_STORE"] = store
+        _MODELS.clear()
+        try:
+            return infer_regime(macro_df)
+        finally:
+            _MODELS.clear()
+            if previous is None:
+                os.environ.pop("CAM_MODEL_STORE", None)
+            else:
+                os.environ["CAM_MODEL_STORE"] = previous
+
+
+def case_inputs(series: int, years: int, seed: int = 0) -> dict:
+    # every stage input for one size: `series` tickers for market stages, `series` indicators for macro stages
+    px = synthetic_prices(series, years, seed)
+    catalog = synthetic_catalog(series, seed)
+    raw = synthetic_series(catalog, years, seed)
+    macro_df = synthetic_regime_features(years, seed)
+    z = (macro_df - macro_df.mean()) / macro_df.std()
+    features = build_market_features(px)
+    return {
+        "px": px, "features": features, "catalog": catalog, "raw": raw, "tidy": synthetic_macro_tidy(catalog, raw),
+        "macro_df": macro_df, "probs": pd.Series({"Goldilocks": 0.4, "Reflation": 0.3, "Slowdown": 0.2, "Stagflation": 0.1}),
+        "growth_z": z["growth"], "infl_z": z["inflation"],
+    }
+
+
+# stage -> builder of the zero-argument call to time from case_inputs
+STAGES: dict[str, Callable[[dict], Callable[[], object]]] = {
+    "pct_rank": lambda c: lambda: pct_rank(c["features"]["monthly_ret"]),
+    "build_market_features": lambda c: lambda: build_market_features(c["px"]),
+    "build_signals": lambda c: lambda: build_signals(c["features"]),
+    "infer_regime": lambda c: lambda: _cold_infer_regime(c["macro_df"]),
+    "recommend_weights": lambda c: lambda: recommend_weights(c["features"]["monthly_ret"], "Balanced", c["probs"], 0.5),
+    "apply_transform": lambda c: lambda: [apply_transform(c["raw"][ind["id"]], ind["transform"]) for ind in c["catalog"]],
+    "build_composites": lambda c: lambda: build_composites(*c["tidy"]),
+    "regime_probabilities": lambda c: lambda: regime_probabilities(c["growth_z"], c["infl_z"]),
+}
+
+
+def measure(fn: Callable[[], object], repeats: int = 3) -> tuple[float, float]:
+    # (best wall time in seconds, peak traced allocation in MB); memory is traced in a separate run so the
+    # tracing overhead stays out of the timings
+    fn()
+    best = np.inf
+    for _ in range(max(1, repeats)):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / 2**20
+
+
+def run_benchmarks(series: list[int] | None = None, years: list[int] | None = None, stages: list[str] | None = None, repeats: int = 3, seed: int = 0) -> pd.DataFrame:
+    rows = []
+    for n in series or BENCH_SERIES:
+        for y in years or BENCH_YEARS:
+            case = case_inputs(n, y, seed)
+            for stage in stages or list(STAGES):
+                seconds, peak_mb = measure(STAGES[stage](case), repeats)
+                rows.append({"stage": stage, "series": n, "years": y, "seconds": seconds, "peak_mb": peak_mb})
+    return pd.DataFrame(rows, columns=["stage", "series", "years", "seconds", "peak_mb"])
+
+
+def baseline_path(path: str | Path | None = None) -> Path:
+    return Path(path or os.environ.get("CAM_BENCH_BASELINE", BENCH_BASELINE_PATH))
+
+
+def save_baseline(results: pd.DataFrame, path: str | Path | None = None) -> Path:
+    path = baseline_path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"created": pd.Timestamp.utcnow().isoformat(), "results": results.to_dict("records")}, indent=1))
+    return path
+
+
+def load_baseline(path: str | Path | None = None) -> pd.DataFrame | None:
+    try:
+        return pd.DataFrame(json.loads(baseline_path(path).read_text())["results"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def check_regressions(results: pd.DataFrame, baseline: pd.DataFrame, max_slowdown: float = BENCH_MAX_SLOWDOWN, noise_floor: float = BENCH_NOISE_FLOOR_SECONDS) -> list[str]:
+    # a case regresses when it is more than `max_slowdown` times its baseline and slower by more than the noise floor
+    keys = ["stage", "series", "years"]
+    both = results.merge(baseline[[*keys, "seconds"]], on=keys, suffixes=("", "_baseline"))
+    slow = both[(both["seconds"] > max_slowdown * both["seconds_baseline"]) & (both["seconds"] - both["seconds_baseline"] > noise_floor)]
+    return [f"{r.stage} (series={r.series}, years={r.years}): {r.seconds * 1000:.1f} ms vs baseline {r.seconds_baseline * 1000:.1f} ms" for r in slow.itertuples()]
+
+
+def _ints(text: str) -> list[int]:
+    return [int(v) for v in text.split(",") if v]
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Time and memory-profile the pipeline stages on synthetic data (offline).")
+    parser.add_argument("--series", type=_ints, default=BENCH_SERIES, help="comma-separated tickers / indicators per case")
+    parser.add_argument("--years", type=_ints, default=BENCH_YEARS, help="comma-separated history lengths")
+    parser.add_argument("--stages", type=lambda t: t.split(","), default=None, help=f"subset of {', '.join(STAGES)}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=None, help=f"baseline file (default {BENCH_BASELINE_PATH}, env CAM_BENCH_BASELINE)")
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any case regressed against the baseline")
+    parser.add_argument("--max-slowdown", type=float, default=BENCH_MAX_SLOWDOWN)
+    parser.add_argument("--csv", default=None, help="also write the raw results to this CSV")
+    args = parser.parse_args(argv)
+    unknown = [s for s in args.stages or [] if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.series, args.years, args.stages, args.repeats, args.seed)
+    if args.csv:
+        results.to_csv(args.csv, index=False)
+    for stage, df in results.groupby("stage", sort=False):
+        print(f"\n{stage}: seconds (peak MB) by series x years")
+        cells = df.assign(cell=[f"{s:.4f} ({m:.1f})" for s, m in zip(df["seconds"], df["peak_mb"])])
+        print(cells.pivot(index="series", columns="years", values="cell").to_string())
+
+    status = 0
+    if args.check:
+        # the incremental feature engine behind the `features` node must track a full recompute
+        drift = engine_drift(synthetic_prices(min(args.series), max(args.years), args.seed))
+        for k, d in drift[drift > BENCH_ENGINE_MAX_DRIFT].items():
+            print(f"BENCH: MarketFeatureEngine {k} drifts {d:.3g} from build_market_features", file=sys.stderr)
+            status = 1
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(f"BENCH: no baseline at {baseline_path(args.baseline)}", file=sys.stderr)
+            status = 1
+        else:
+            for p in check_regressions(results, baseline, args.max_slowdown):
+                print(f"BENCH: {p}", file=sys.stderr)
+                status = 1
+    if args.save_baseline:
+        print(f"\nbaseline written to {save_baseline(results, args.baseline)}")
+    return status
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
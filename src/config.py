@@ -32,6 +32,25 @@ PROFILE_ANCHORS = {
     "Growth": {"equity": 0.65, "bonds": 0.25, "gold": 0.10},
 }
 
+# flex values (anchor tilt, fraction) swept by the allocation scenario grid
+ALLOCATION_FLEX_GRID = [0.0, 0.025, 0.05, 0.075, 0.10, 0.15, 0.20]
+
+# forward risk: regime-conditioned block bootstrap of monthly returns (paths, months, block length, seed, paths/shard)
+MC_PATHS = 20000
+MC_HORIZON = 12
+MC_BLOCK = 3
+MC_SEED = 7
+MC_SHARD_PATHS = 25000
+
+# line charts: max points per trace after downsampling, share of unchanged consecutive values that marks a
+# forward-filled (step) series, and total plotted points from which traces switch to WebGL
+PLOT_MAX_POINTS = 1500
+PLOT_STEP_MIN_FLAT = 0.5
+PLOT_WEBGL_MIN_POINTS = 20000
+# built figures reused across reruns while their inputs are unchanged (LRU, entries and plotted-array MB)
+PLOT_CACHE_MAX_ENTRIES = 256
+PLOT_CACHE_MAX_MB = 64
+
 MIN_HISTORY_YEARS_TARGET = 15
 MIN_HISTORY_YEARS_HARD = 5
 MAX_STALENESS_DAYS_MONTHLY = 60
@@ -85,3 +104,70 @@ RATIO_PAIRS = {
     "IEAC.L/LQD": ("IEAC.L", "LQD"), "IHYG.L/HYG": ("IHYG.L", "HYG"),
     "BZ=F/^GSPC": ("BZ=F", "^GSPC"), "CL=F/^GSPC": ("CL=F", "^GSPC"),
 }
+
+# concurrent catalog fetch: max in-flight requests per provider and overall deadline (seconds)
+PROVIDER_MAX_CONCURRENCY = {"FRED": 4, "OECD": 2, "EUROSTAT": 3, "ECB": 3, "TREASURY": 1, "WORLDBANK": 2, "BUNDESBANK": 2}
+CATALOG_FETCH_DEADLINE_SECONDS = 90
+
+# resolve_series: a candidate still running after this many seconds gets the next-priority one started alongside it
+RESOLVE_HEDGE_SECONDS = 4.0
+
+# persistent series store: serve from disk while fresh, refetch only the recent tail, full re-pull periodically
+SERIES_STORE_DIR = ".cache/series"
+SERIES_STORE_MAX_AGE_HOURS = 6
+SERIES_STORE_TAIL_OVERLAP_DAYS = 93
+SERIES_STORE_FULL_REFRESH_DAYS = 7
+
+# shared HTTP layer: keep-alive pool size per host and on-disk validator cache for conditional GETs
+HTTP_POOL_MAXSIZE = 8
+HTTP_CACHE_DIR = ".cache/http"
+HTTP_CACHE_MAX_ENTRIES = 512
+
+# record/replay mirror of provider responses (CAM_MIRROR=off|record|replay, CAM_MIRROR_DIR); in replay the
+# latency (seconds or "recorded") and failure rate may be set per provider, e.g. "FRED=1.5,*=0.2"
+MIRROR_MODE = "off"
+MIRROR_DIR = ".cache/mirror"
+MIRROR_LATENCY = "0"
+MIRROR_JITTER = 0.0
+MIRROR_FAIL_RATE = "0"
+MIRROR_SEED = 0
+
+# storage dtype of derived market features (FeatureBundle); float32 halves per-session memory
+FEATURE_DTYPE = "float32"
+# market feature engines kept for incremental refresh (one per ticker universe, start and end date); each holds
+# float64 buffers of every feature (~22 MB for 70 tickers x 20 years), so two cover a refresh or two pinned sessions
+FEATURE_ENGINE_MAX_ENTRIES = 2
+
+# fitted regime models (GaussianMixture) persisted by feature fingerprint; refits warm-start from a fit that
+# is at most REGIME_WARM_START_MAX_NEW months behind
+REGIME_MODEL_DIR = ".cache/models"
+REGIME_MODEL_MAX_ENTRIES = 64
+REGIME_WARM_START_MAX_NEW = 12
+
+# precomputed pipeline snapshots written by `python -m src.snapshot`
+SNAPSHOT_DIR = ".cache/snapshots"
+SNAPSHOT_KEEP = 5
+# at most one data epoch (monitor.DATA_TTL_SECONDS): an older snapshot could not seed a live pipeline anyway
+SNAPSHOT_MAX_AGE_HOURS = 6
+
+# offline benchmarks (`python -m src.bench`): default case grid, baseline file and regression threshold
+BENCH_SERIES = [10, 25, 50]
+BENCH_YEARS = [5, 10, 20]
+BENCH_BASELINE_PATH = ".cache/bench/baseline.json"
+BENCH_MAX_SLOWDOWN = 1.5
+BENCH_NOISE_FLOOR_SECONDS = 0.01
+# `--check` also fails when the incremental feature engine differs from a full recompute by more than this
+BENCH_ENGINE_MAX_DRIFT = 1e-9
+
+# instrumentation: events kept in memory (stage spans, provider requests, cache lookups) for the Sources tab
+INSTRUMENT_MAX_EVENTS = 20000
+# sessions whose latest run id is kept for tagging events
+INSTRUMENT_MAX_SESSIONS = 1024
+
+# startup budget checked by `python -m src.startup`: cumulative import time (ms) per entry module on top of the
+# always-needed baseline, and heavy dependencies that must only be imported on first use
+IMPORT_BASELINE = ["numpy", "pandas", "streamlit"]
+IMPORT_BUDGET_MS = {"src.monitor": 60, "src.plots": 30, "src.snapshot": 20, "src.ui.how_we_compute": 10}
+# everything app.py imports on top of the baseline, together
+IMPORT_TOTAL_BUDGET_MS = 120
+DEFERRED_IMPORTS = ["sklearn", "scipy", "yfinance", "fredapi", "plotly.express", "requests"]
@@ -1,12 +1,18 @@
 from __future__ import annotations
 
-import io
+import time
+from concurrent.futures import Future
+from functools import partial
+
 import pandas as pd
-import requests
-import streamlit as st
 
-from src.config import CONCEPT_PRIORITY, MAX_MISSINGNESS_AFTER_RESAMPLE, MAX_STALENESS_DAYS_MONTHLY
+from src.config import CONCEPT_PRIORITY, MAX_MISSINGNESS_AFTER_RESAMPLE, MAX_STALENESS_DAYS_MONTHLY, RESOLVE_HEDGE_SECONDS
 from src.data_fred import fetch_fred_series
+from src.data_sources.executor import provider_slot, run_hedged
+from src.data_sources.http_client import get as http_get
+from src.data_sources.store import FULL_HISTORY_START, cached_series
+from src.data_sources.treasury_client import treasury_series
+from src.instrument import cache_data, stage
 
 
 def _quality(df: pd.DataFrame) -> tuple[float, dict]:
@@ -23,30 +29,15 @@ def _quality(df: pd.DataFrame) -> tuple[float, dict]:
 
 
 def _fetch_treasury(code: str, start: str, end: str | None) -> pd.DataFrame:
-    url = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates/DailyTreasuryYieldCurveRateData.csv"
-    try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        raw = pd.read_csv(io.StringIO(r.text))
-        raw["Date"] = pd.to_datetime(raw["Date"], errors="coerce")
-        col_map = {"DGS2": "2 Yr", "DGS3MO": "3 Mo", "DGS10": "10 Yr", "DGS30": "30 Yr"}
-        col = col_map.get(code)
-        if not col or col not in raw.columns:
-            return pd.DataFrame(columns=["value"])
-        out = raw[["Date", col]].dropna().rename(columns={"Date": "date", col: "value"}).set_index("date").sort_index()
-        out = out[(out.index >= pd.Timestamp(start)) & (out.index <= pd.Timestamp(end) if end else True)]
-        return out
-    except Exception:
-        return pd.DataFrame(columns=["value"])
+    return treasury_series(code, start, end)
 
 
-def _fetch_worldbank(series_id: str, start: str, end: str | None) -> pd.DataFrame:
+def _download_worldbank(series_id: str, start: str, end: str | None) -> pd.DataFrame:
     try:
         country, indicator = series_id.split("|", 1)
-        url = f"https://api.worldbank.org/v2/country/{country}/indicator/{indicator}?format=json&per_page=20000"
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        data = r.json()
+        years = f"{pd.Timestamp(start).year}:{pd.Timestamp(end).year if end else pd.Timestamp.today().year}"
+        url = f"https://api.worldbank.org/v2/country/{country}/indicator/{indicator}?format=json&per_page=20000&date={years}"
+        data = http_get(url, label="World Bank").json()
         if not isinstance(data, list) or len(data) < 2:
             return pd.DataFrame(columns=["value"])
         out = pd.DataFrame(data[1])[["date", "value"]].dropna()
@@ -58,16 +49,18 @@ def _fetch_worldbank(series_id: str, start: str, end: str | None) -> pd.DataFram
         return pd.DataFrame(columns=["value"])
 
 
-def _fetch_eurostat(series_id: str, start: str, end: str | None) -> pd.DataFrame:
+def _fetch_worldbank(series_id: str, start: str, end: str | None) -> pd.DataFrame:
+    return cached_series("WORLDBANK", series_id, start, end, partial(_download_worldbank, series_id))
+
+
+def _download_eurostat(series_id: str) -> pd.DataFrame:
     # series_id format: dataset?param=val&param=val
     try:
         dataset, _, query = series_id.partition("?")
         url = f"https://ec.europa.eu/eurostat/api/dissemination/statistics/1.0/data/{dataset}"
         if query:
             url = f"{url}?{query}"
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        js = r.json()
+        js = http_get(url, label="Eurostat").json()
         vals = js.get("value", {})
         if not vals:
             return pd.DataFrame(columns=["value"])
@@ -76,13 +69,18 @@ def _fetch_eurostat(series_id: str, start: str, end: str | None) -> pd.DataFrame
         out = pd.DataFrame({"idx": list(vals.keys()), "value": list(vals.values())})
         out["idx"] = out["idx"].astype(int)
         out["date"] = pd.to_datetime(out["idx"].map(rev), errors="coerce")
-        out = out.dropna().set_index("date").sort_index()[["value"]]
-        out = out[(out.index >= pd.Timestamp(start)) & (out.index <= pd.Timestamp(end) if end else True)]
-        return out
+        return out.dropna().set_index("date").sort_index()[["value"]]
     except Exception:
         return pd.DataFrame(columns=["value"])
 
 
+def _fetch_eurostat(series_id: str, start: str, end: str | None) -> pd.DataFrame:
+    # the endpoint always returns the full history: store it under FULL_HISTORY_START like eurostat_client, which
+    # shares the EUROSTAT entries, and slice, so the two callers' start dates never trigger a full re-pull
+    out = cached_series("EUROSTAT", series_id, FULL_HISTORY_START, None, lambda s, e: _download_eurostat(series_id), incremental=False)
+    return out.loc[pd.Timestamp(start) : pd.Timestamp(end) if end else None]
+
+
 def _fetch_oecd(series_id: str, start: str, end: str | None) -> pd.DataFrame:
     return pd.DataFrame(columns=["value"])
 
@@ -95,48 +93,101 @@ def _fetch_bundesbank(series_id: str, start: str, end: str | None) -> pd.DataFra
     return pd.DataFrame(columns=["value"])
 
 
-@st.cache_data(ttl=21600)
-def resolve_series(concept: str, region: str, start: str, end: str | None = None, prefer_monthly: bool = True, provider_flags: dict | None = None):
+def _fetch_candidate(source: str, sid: str, start: str, end: str | None) -> pd.DataFrame:
+    if source == "FRED":
+        return fetch_fred_series(sid, start, end)
+    if source == "TREASURY":
+        return _fetch_treasury(sid, start, end)
+    if source == "OECD":
+        return _fetch_oecd(sid, start, end)
+    if source == "ECB":
+        return _fetch_ecb(sid, start, end)
+    if source == "BUNDESBANK":
+        return _fetch_bundesbank(sid, start, end)
+    if source == "WORLDBANK":
+        return _fetch_worldbank(sid, start, end)
+    if source == "EUROSTAT":
+        return _fetch_eurostat(sid, start, end)
+    return pd.DataFrame(columns=["value"])
+
+
+def _scored(candidate: str, start: str, end: str | None) -> tuple[pd.DataFrame, float, dict, float]:
+    source, sid = candidate.split(":", 1)
+    t0 = time.perf_counter()
+    with stage(candidate, kind="fetch"), provider_slot(source):
+        df = _fetch_candidate(source, sid, start, end)
+    if not df.empty:
+        df.index = pd.to_datetime(df.index)
+        df = df.sort_index()
+    score, q = _quality(df)
+    return df, score, q, time.perf_counter() - t0
+
+
+class _Hedged(Exception):
+    # carries a resolution that won by hedging: st.cache_data keeps no exceptions, so it is never cached
+    def __init__(self, result: tuple[pd.DataFrame, dict]):
+        super().__init__("resolved by a hedged candidate")
+        self.result = result
+
+
+def resolve_series(concept: str, region: str, start: str, end: str | None = None, prefer_monthly: bool = True, provider_flags: dict | None = None,
+                   hedge_after: float | None = RESOLVE_HEDGE_SECONDS):
+    # Only resolutions in plain priority order are cached; one that abandoned a slow higher-priority candidate
+    # is served once, and the next call tries that candidate again (usually answered by now from its own cache).
+    try:
+        return _resolve_cached(concept, region, start, end, provider_flags, hedge_after)
+    except _Hedged as e:
+        return e.result
+
+
+@cache_data(ttl=21600)
+def _resolve_cached(concept: str, region: str, start: str, end: str | None, provider_flags: dict | None, hedge_after: float | None):
+    with stage(f"resolve_series:{concept}", kind="fetch"):
+        out = _resolve(concept, region, start, end, provider_flags, hedge_after)
+    if any(e["status"] == "hedged" for e in out[1]["lineage"]):
+        raise _Hedged(out)
+    return out
+
+
+def _resolve(concept: str, region: str, start: str, end: str | None, provider_flags: dict | None, hedge_after: float | None = None):
+    # Candidates are tried in CONCEPT_PRIORITY order and the first good-enough one wins, as if fetched one after
+    # another; with `hedge_after` a candidate still running after that many seconds gets the next one started
+    # alongside it, and a good-enough answer from the backup then wins over the slow candidates before it.
     provider_flags = provider_flags or {"OECD": True, "TREASURY": True, "ECB": True, "BUNDESBANK": True, "WORLDBANK": True, "EUROSTAT": True}
+    candidates = CONCEPT_PRIORITY.get(concept, [])
+    active = [c for c in candidates if provider_flags.get(c.split(":", 1)[0], True)]
+    good = 1 - MAX_MISSINGNESS_AFTER_RESAMPLE
+    done: dict[str, Future] = {}
+    winner = None
+    jobs = run_hedged([partial(_scored, c, start, end) for c in active], hedge_after, name=f"resolve-{concept}")
+    try:
+        for i, fut in jobs:
+            done[active[i]] = fut
+            winner = next((c for c in active if c in done and done[c].exception() is None and done[c].result()[1] >= good), None)
+            if winner is not None:
+                break
+    finally:
+        jobs.close()
+
     lineage: list[dict] = []
     best_df = pd.DataFrame(columns=["value"])
     best_meta = {"concept": concept, "region": region, "source": "NONE", "series_id": "", "lineage": []}
-
-    for candidate in CONCEPT_PRIORITY.get(concept, []):
+    for candidate in candidates:
         source, sid = candidate.split(":", 1)
-        if source in provider_flags and not provider_flags[source]:
+        if candidate not in active:
             lineage.append({"candidate": candidate, "status": "skipped", "reason": "provider disabled"})
-            continue
-        try:
-            if source == "FRED":
-                df = fetch_fred_series(sid, start, end)
-            elif source == "TREASURY":
-                df = _fetch_treasury(sid, start, end)
-            elif source == "OECD":
-                df = _fetch_oecd(sid, start, end)
-            elif source == "ECB":
-                df = _fetch_ecb(sid, start, end)
-            elif source == "BUNDESBANK":
-                df = _fetch_bundesbank(sid, start, end)
-            elif source == "WORLDBANK":
-                df = _fetch_worldbank(sid, start, end)
-            elif source == "EUROSTAT":
-                df = _fetch_eurostat(sid, start, end)
-            else:
-                df = pd.DataFrame(columns=["value"])
-
-            if not df.empty:
-                df.index = pd.to_datetime(df.index)
-                df = df.sort_index()
-            score, q = _quality(df)
-            lineage.append({"candidate": candidate, "status": "ok" if score > 0 else "bad", "quality_score": score, **q})
+        elif candidate not in done:
+            lineage.append({"candidate": candidate, "status": "hedged", "reason": f"no answer within {hedge_after}s, a lower-priority candidate answered first"})
+        elif done[candidate].exception() is not None:
+            lineage.append({"candidate": candidate, "status": "error", "reason": str(done[candidate].exception())})
+        else:
+            df, score, q, seconds = done[candidate].result()
+            lineage.append({"candidate": candidate, "status": "ok" if score > 0 else "bad", "quality_score": score, "seconds": seconds, **q})
             if score > _quality(best_df)[0]:
                 best_df = df
                 best_meta = {"concept": concept, "region": region, "source": source, "series_id": sid, "quality_score": score, **q}
-            if score >= (1 - MAX_MISSINGNESS_AFTER_RESAMPLE):
-                break
-        except Exception as e:
-            lineage.append({"candidate": candidate, "status": "error", "reason": str(e)})
+        if candidate == winner:
+            break
 
     best_meta["lineage"] = lineage
     return best_df, best_meta
@@ -1,39 +1,61 @@
 from __future__ import annotations
 
+import os
+import time
+from functools import partial
+
 import pandas as pd
 import streamlit as st
-from fredapi import Fred
+
+from src.data_sources import mirror
+from src.data_sources.store import cached_series
+from src.instrument import cache_data, record
 
 
 def _get_fred_key() -> str | None:
     try:
         key = st.secrets.get("FRED_API_KEY", None)
     except Exception:
-        return None
+        key = None
+    # headless runs (python -m src.snapshot) have no Streamlit secrets
+    key = key if key is not None else os.environ.get("FRED_API_KEY")
     if key is None:
         return None
     key = str(key).strip()
     return key or None
 
 
-@st.cache_data(ttl=21600, show_spinner=False)
-def fetch_fred_series(series_id: str, start: str, end: str | None = None) -> pd.DataFrame:
-    key = _get_fred_key()
-    if not key:
+def _fred_values(series_id: str, start: str, end: str | None) -> pd.DataFrame:
+    from fredapi import Fred  # heavy import, deferred to first download
+
+    ser = Fred(api_key=_get_fred_key()).get_series(series_id, observation_start=start, observation_end=end)
+    return pd.DataFrame(columns=["value"]) if ser is None else ser.to_frame("value")
+
+
+def _download_fred(series_id: str, start: str, end: str | None = None) -> pd.DataFrame:
+    # a replay from the mirror needs no API key
+    if not _get_fred_key() and mirror.mode() != "replay":
         return pd.DataFrame(columns=["value"])
 
+    t0 = time.perf_counter()
     try:
-        fred = Fred(api_key=key)
-        ser = fred.get_series(series_id, observation_start=start, observation_end=end)
+        df = mirror.frame("FRED", series_id, partial(_fred_values, series_id, start, end), start, end)
     except BaseException:
+        record("request", provider="FRED", host="api.stlouisfed.org", status=None, ok=False, seconds=time.perf_counter() - t0, bytes=0, retries=0, mirror=mirror.mode())
         return pd.DataFrame(columns=["value"])
+    # fredapi hides the response; bytes are the parsed values
+    record("request", provider="FRED", host="api.stlouisfed.org", status=200, ok=True, seconds=time.perf_counter() - t0, bytes=int(df["value"].nbytes), retries=0, mirror=mirror.mode())
 
-    if ser is None or ser.empty:
+    if df.empty:
         return pd.DataFrame(columns=["value"])
 
     try:
-        df = ser.to_frame("value")
         df.index = pd.to_datetime(df.index, errors="coerce")
         return df.dropna(how="all")
     except BaseException:
         return pd.DataFrame(columns=["value"])
+
+
+@cache_data(ttl=21600, show_spinner=False)
+def fetch_fred_series(series_id: str, start: str, end: str | None = None) -> pd.DataFrame:
+    return cached_series("FRED", series_id, start, end, partial(_download_fred, series_id))
@@ -1,28 +1,25 @@
 from __future__ import annotations
 
-import time
+from functools import partial
+from typing import TYPE_CHECKING
+
 import pandas as pd
-import requests
-import streamlit as st
+
+from src.data_sources.http_client import get as http_get
+from src.data_sources.store import cached_series
+from src.instrument import cache_data
+
+if TYPE_CHECKING:
+    import requests
 
 BASE = "https://data-api.ecb.europa.eu/service/data"
 
 
 def _get(url: str, timeout: int = 20, retries: int = 3) -> requests.Response:
-    last: Exception | None = None
-    for i in range(retries):
-        try:
-            r = requests.get(url, timeout=timeout)
-            r.raise_for_status()
-            return r
-        except Exception as e:
-            last = e
-            time.sleep(0.7 * (i + 1))
-    raise RuntimeError(f"ECB fetch failed: {last}")
-
-
-@st.cache_data(ttl=21600)
-def fetch_ecb_series(flow: str, key: str, start: str, end: str | None = None) -> pd.DataFrame:
+    return http_get(url, timeout=timeout, retries=retries, label="ECB")
+
+
+def _download(flow: str, key: str, start: str, end: str | None = None) -> pd.DataFrame:
     end_q = f"&endPeriod={pd.Timestamp(end).strftime('%Y-%m-%d')}" if end else ""
     url = f"{BASE}/{flow}/{key}?startPeriod={pd.Timestamp(start).strftime('%Y-%m-%d')}{end_q}&format=csvdata"
     try:
@@ -37,3 +34,8 @@ def fetch_ecb_series(flow: str, key: str, start: str, end: str | None = None) ->
         return out.dropna().set_index("date").sort_index()
     except Exception:
         return pd.DataFrame(columns=["value"])
+
+
+@cache_data(ttl=21600)
+def fetch_ecb_series(flow: str, key: str, start: str, end: str | None = None) -> pd.DataFrame:
+    return cached_series("ECB", f"{flow}/{key}", start, end, partial(_download, flow, key))
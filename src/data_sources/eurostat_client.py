@@ -1,31 +1,24 @@
 from __future__ import annotations
 
-import time
+from typing import TYPE_CHECKING
+
 import pandas as pd
-import requests
-import streamlit as st
+
+from src.data_sources.http_client import get as http_get
+from src.data_sources.store import FULL_HISTORY_START, cached_series
+from src.instrument import cache_data
+
+if TYPE_CHECKING:
+    import requests
 
 BASE = "https://ec.europa.eu/eurostat/api/dissemination/statistics/1.0/data"
 
 
 def _get(url: str, timeout: int = 20, retries: int = 3) -> requests.Response:
-    last: Exception | None = None
-    for i in range(retries):
-        try:
-            r = requests.get(url, timeout=timeout)
-            r.raise_for_status()
-            return r
-        except Exception as e:
-            last = e
-            time.sleep(0.7 * (i + 1))
-    raise RuntimeError(f"Eurostat fetch failed: {last}")
-
-
-@st.cache_data(ttl=21600)
-def fetch_eurostat_series(dataset: str, filters: dict[str, str] | None = None) -> pd.DataFrame:
-    filters = filters or {}
-    query = "&".join([f"{k}={v}" for k, v in filters.items()])
-    url = f"{BASE}/{dataset}?{query}" if query else f"{BASE}/{dataset}"
+    return http_get(url, timeout=timeout, retries=retries, label="Eurostat")
+
+
+def _download(url: str) -> pd.DataFrame:
     try:
         js = _get(url).json()
         vals = js.get("value", {})
@@ -40,3 +33,12 @@ def fetch_eurostat_series(dataset: str, filters: dict[str, str] | None = None) -
         return out[["date", "value"]].dropna().set_index("date").sort_index()
     except Exception:
         return pd.DataFrame(columns=["value"])
+
+
+@cache_data(ttl=21600)
+def fetch_eurostat_series(dataset: str, filters: dict[str, str] | None = None) -> pd.DataFrame:
+    filters = filters or {}
+    query = "&".join([f"{k}={v}" for k, v in filters.items()])
+    series_id = f"{dataset}?{query}" if query else dataset
+    # the dataset endpoint has no frequency-agnostic date filter, so refreshes re-pull the full history
+    return cached_series("EUROSTAT", series_id, FULL_HISTORY_START, None, lambda start, end: _download(f"{BASE}/{series_id}"), incremental=False)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from src.config import PROVIDER_MAX_CONCURRENCY
+
+# process-wide caps on in-flight requests per provider, shared by every pool (catalog fetch, concept resolution)
+_SLOTS = {provider: threading.BoundedSemaphore(n) for provider, n in PROVIDER_MAX_CONCURRENCY.items()}
+
+
+@contextmanager
+def provider_slot(provider: str):
+    # holds one of PROVIDER_MAX_CONCURRENCY[provider] slots for the block; providers without a cap run freely
+    slot = _SLOTS.get(provider.upper())
+    if slot is None:
+        yield
+        return
+    with slot:
+        yield
+
+
+def _in_slot(provider: str, fn: Callable[[], Any]) -> Callable[[], Any]:
+    def run() -> Any:
+        with provider_slot(provider):
+            return fn()
+    return run
+
+
+def _script_ctx_binder() -> Callable[[Callable[[], Any]], Callable[[], Any]]:
+    # Worker threads need the Streamlit script context so st.cache_data/st.secrets behave as in the main thread.
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        ctx = None
+    if ctx is None:
+        return lambda fn: fn
+
+    def bind(fn: Callable[[], Any]) -> Callable[[], Any]:
+        def run() -> Any:
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return fn()
+        return run
+
+    return bind
+
+
+def run_grouped(jobs: list[tuple[str, Callable[[], Any]]], limits: dict[str, int] | None = None, deadline: float | None = None, default_limit: int = 2) -> list[Any]:
+    # One pool per group caps in-flight jobs per call; groups named after a provider also take a provider_slot,
+    # so concurrent callers stay within PROVIDER_MAX_CONCURRENCY together. Results come back in job order.
+    # Jobs that raise or miss the global deadline yield None (queued ones are cancelled).
+    limits = limits or {}
+    bind = _script_ctx_binder()
+    pools: dict[str, ThreadPoolExecutor] = {}
+    futures = []
+    for group, fn in jobs:
+        if group not in pools:
+            pools[group] = ThreadPoolExecutor(max_workers=max(1, int(limits.get(group, default_limit))), thread_name_prefix=f"fetch-{group.lower()}")
+        futures.append(pools[group].submit(bind(_in_slot(group, fn))))
+    done, _ = wait(futures, timeout=deadline)
+    for pool in pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    return [f.result() if f in done and f.exception() is None else None for f in futures]
+
+
+def run_hedged(jobs: list[Callable[[], Any]], hedge_after: float | None, name: str = "hedge") -> Iterator[tuple[int, Future]]:
+    # Runs jobs in order, one at a time, yielding (index, future) as each finishes; when the newest job has not
+    # finished within `hedge_after` seconds the next one is started alongside it (None: strictly sequential).
+    # Closing the iterator abandons whatever is still queued or running.
+    bind = _script_ctx_binder()
+    pool = ThreadPoolExecutor(max_workers=max(1, len(jobs)), thread_name_prefix=name)
+    pending: dict[Future, int] = {}
+    started = 0
+    try:
+        while started < len(jobs) or pending:
+            if not pending:
+                pending[pool.submit(bind(jobs[started]))] = started
+                started += 1
+            done, _ = wait(pending, timeout=hedge_after if started < len(jobs) else None, return_when=FIRST_COMPLETED)
+            if not done:
+                pending[pool.submit(bind(jobs[started]))] = started
+                started += 1
+            for f in sorted(done, key=pending.get):
+                yield pending.pop(f), f
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from src.config import HTTP_CACHE_DIR, HTTP_CACHE_MAX_ENTRIES, HTTP_POOL_MAXSIZE
+from src.data_sources import mirror
+from src.instrument import record
+
+if TYPE_CHECKING:
+    import requests
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 30.0
+
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def session_for(url: str) -> requests.Session:
+    # one keep-alive session (and connection pool) per host, shared across threads
+    import requests  # deferred: only paid once something is actually fetched
+    from requests.adapters import HTTPAdapter
+
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        s = _sessions.get(host)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "cross-asset-monitor"})
+            _sessions[host] = s
+        return s
+
+
+def _cache_paths(url: str) -> tuple[Path, Path]:
+    root = Path(os.environ.get("CAM_HTTP_CACHE", HTTP_CACHE_DIR))
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return root / f"{digest}.json", root / f"{digest}.body"
+
+
+def _load_cached(url: str) -> tuple[dict, bytes | None]:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8")), body_path.read_bytes()
+    except Exception:
+        return {}, None
+
+
+def _store_cached(url: str, r: requests.Response) -> None:
+    validators = {k: r.headers[h] for k, h in [("etag", "ETag"), ("last_modified", "Last-Modified")] if r.headers.get(h)}
+    if not validators:
+        return
+    meta_path, body_path = _cache_paths(url)
+    meta = {**validators, "url": url, "encoding": r.encoding, "content_type": r.headers.get("Content-Type", "")}
+    try:
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp = Path(f"{body_path}{suffix}")
+        tmp.write_bytes(r.content)
+        os.replace(tmp, body_path)
+        tmp = Path(f"{meta_path}{suffix}")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+        _prune(meta_path.parent)
+    except Exception:
+        pass
+
+
+def _prune(root: Path) -> None:
+    entries = sorted(root.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for p in entries[: max(0, len(entries) - HTTP_CACHE_MAX_ENTRIES)]:
+        for f in (p, p.with_suffix(".body")):
+            f.unlink(missing_ok=True)
+
+
+def _from_cache(url: str, meta: dict, body: bytes) -> requests.Response:
+    import requests
+
+    r = requests.Response()
+    r.status_code = 200
+    r.url = url
+    r._content = body
+    r.encoding = meta.get("encoding")
+    r.headers["Content-Type"] = meta.get("content_type", "")
+    r.from_cache = True
+    return r
+
+
+def _retry_after(r: requests.Response | None) -> float | None:
+    raw = r.headers.get("Retry-After") if r is not None else None
+    if not raw:
+        return None
+    try:
+        return min(float(raw), MAX_RETRY_AFTER)
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(raw).timestamp()
+        return min(max(0.0, when - time.time()), MAX_RETRY_AFTER)
+    except Exception:
+        return None
+
+
+def get(url: str, timeout: int = 20, retries: int = 3, conditional: bool = True, label: str = "HTTP") -> requests.Response:
+    # GET with pooled keep-alive connections, jittered backoff (honouring Retry-After) and, when the server
+    # sends ETag/Last-Modified, conditional revalidation so unchanged resources come back as cheap 304s.
+    # Every call records one `request` event: latency including backoff, bytes received, retries, final status.
+    # Under CAM_MIRROR the call is recorded to, or replayed from, the local mirror (src/data_sources/mirror.py).
+    counters: dict = {}
+    t0, r = time.perf_counter(), None
+    try:
+        r = mirror.http(label, url, lambda: _get(url, timeout, retries, conditional, label, counters), counters)
+        return r
+    finally:
+        record("request", provider=label, host=urlsplit(url).netloc, status=304 if getattr(r, "from_cache", False) else counters.get("status"),
+               ok=r is not None, seconds=time.perf_counter() - t0, bytes=counters.get("bytes", 0), retries=max(counters.get("attempts", 0) - 1, 0),
+               mirror=mirror.mode())
+
+
+def _get(url: str, timeout: int, retries: int, conditional: bool, label: str, counters: dict) -> requests.Response:
+    import requests
+
+    meta, body = _load_cached(url) if conditional else ({}, None)
+    headers = {}
+    if body is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    last: Exception | None = None
+    for i in range(retries):
+        r = None
+        try:
+            counters["attempts"] = i + 1
+            r = session_for(url).get(url, timeout=timeout, headers=headers)
+            counters["status"], counters["bytes"] = r.status_code, counters.get("bytes", 0) + len(r.content)
+            if r.status_code == 304 and body is not None:
+                return _from_cache(url, meta, body)
+            r.raise_for_status()
+            if conditional:
+                _store_cached(url, r)
+            return r
+        except requests.HTTPError as e:
+            last = e
+            if r is not None and r.status_code not in RETRY_STATUS:
+                break
+        except Exception as e:
+            last = e
+        if i < retries - 1:
+            wait = _retry_after(r)
+            time.sleep(wait if wait is not None else min(10.0, 0.7 * 2**i) * random.uniform(0.5, 1.5))
+    raise RuntimeError(f"{label} fetch failed: {last}")
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tarfile
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+import pandas as pd
+
+from src.config import MIRROR_DIR, MIRROR_FAIL_RATE, MIRROR_JITTER, MIRROR_LATENCY, MIRROR_MODE, MIRROR_SEED
+from src.instrument import record
+
+if TYPE_CHECKING:
+    import requests
+
+# Record/replay of provider responses. CAM_MIRROR=record passes every request through and stores the response
+# in the mirror (one gzip entry per request: a JSON header line, then the raw body or a parquet frame);
+# CAM_MIRROR=replay serves requests from the mirror only, after an injected delay, and fails on a miss or an
+# injected failure exactly as an unreachable provider would. Latency and failure specs are a number, or
+# comma-separated PROVIDER=value pairs with `*` as the fallback; latency also accepts `recorded` (the delay
+# measured while recording). Delay jitter and injected failures are a pure function of (seed, provider, key),
+# so a replay is reproducible. A response that cannot be stored is reported on stderr, counted in
+# write_errors() and recorded as a `mirror_error` event, so a record run never leaves silent holes.
+_LOCK = threading.Lock()
+_FRAME_LOCK = threading.Lock()
+_WRITE_ERRORS: list[dict] = []
+
+
+def mode() -> str:
+    return os.environ.get("CAM_MIRROR", MIRROR_MODE).strip().lower()
+
+
+def _root() -> Path:
+    return Path(os.environ.get("CAM_MIRROR_DIR", MIRROR_DIR))
+
+
+def _path(provider: str, key: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", provider).strip("_").upper()
+    return _root() / slug / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.gz"
+
+
+def _spec(raw: str, provider: str) -> str:
+    # "0.5" or "FRED=1.5,Yahoo=recorded,*=0.1" -> the value for `provider`
+    values = dict(part.split("=", 1) if "=" in part else ("*", part) for part in raw.replace(" ", "").split(",") if part)
+    return values.get(provider, values.get(provider.upper(), values.get("*", "0")))
+
+
+def _uniform(provider: str, key: str, salt: str) -> float:
+    seed = os.environ.get("CAM_MIRROR_SEED", str(MIRROR_SEED))
+    return int(hashlib.sha1(f"{seed}|{provider}|{key}|{salt}".encode("utf-8")).hexdigest()[:12], 16) / 16**12
+
+
+def _inject(provider: str, key: str, recorded: float) -> None:
+    latency = _spec(os.environ.get("CAM_MIRROR_LATENCY", MIRROR_LATENCY), provider)
+    delay = recorded if latency == "recorded" else float(latency)
+    jitter = float(os.environ.get("CAM_MIRROR_JITTER", MIRROR_JITTER))
+    if delay > 0:
+        time.sleep(delay * (1 + jitter * (2 * _uniform(provider, key, "latency") - 1)))
+    if _uniform(provider, key, "fail") < float(_spec(os.environ.get("CAM_MIRROR_FAIL_RATE", MIRROR_FAIL_RATE), provider)):
+        raise RuntimeError(f"{provider} fetch failed: injected failure")
+
+
+def _read_file(path: Path) -> tuple[dict, bytes] | None:
+    try:
+        head, _, body = gzip.decompress(path.read_bytes()).partition(b"\n")
+        return json.loads(head), body
+    except Exception:
+        return None
+
+
+def _read(provider: str, key: str) -> tuple[dict, bytes] | None:
+    return _read_file(_path(provider, key))
+
+
+def _write_failed(provider: str, key: str, error: Exception) -> None:
+    entry = {"provider": provider, "key": key, "error": f"{type(error).__name__}: {error}"}
+    with _LOCK:
+        _WRITE_ERRORS.append(entry)
+    record("mirror_error", **entry)
+    print(f"mirror: could not record {provider} {key}: {entry['error']}", file=sys.stderr)
+
+
+def write_errors() -> list[dict]:
+    with _LOCK:
+        return list(_WRITE_ERRORS)
+
+
+def _write(provider: str, key: str, header: dict, body: bytes) -> None:
+    path = _path(provider, key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{path}.{os.getpid()}.{threading.get_ident()}.tmp")
+        head = json.dumps({"provider": provider, "key": key, "recorded_at": pd.Timestamp.utcnow().isoformat(), **header})
+        tmp.write_bytes(gzip.compress(head.encode("utf-8") + b"\n" + body))
+        os.replace(tmp, path)
+    except Exception as e:
+        _write_failed(provider, key, e)
+
+
+def _replay_miss(provider: str, key: str) -> RuntimeError:
+    return RuntimeError(f"{provider} fetch failed: not in mirror {_root()} ({key})")
+
+
+def http(provider: str, url: str, fetch: Callable[[], requests.Response], counters: dict) -> requests.Response:
+    # http_client.get through the mirror; `counters` gets the replayed status and bytes
+    if mode() == "replay":
+        entry = _read(provider, url)
+        if entry is None:
+            raise _replay_miss(provider, url)
+        header, body = entry
+        _inject(provider, url, header.get("seconds", 0.0))
+        import requests
+
+        r = requests.Response()
+        r.status_code, r.url, r._content, r.encoding = header.get("status", 200), url, body, header.get("encoding")
+        r.headers["Content-Type"] = header.get("content_type", "")
+        counters.update(status=r.status_code, bytes=len(body), attempts=1)
+        return r
+    t0 = time.perf_counter()
+    r = fetch()
+    if mode() == "record":
+        header = {"kind": "http", "status": 200, "encoding": r.encoding, "content_type": r.headers.get("Content-Type", ""), "seconds": time.perf_counter() - t0}
+        _write(provider, url, header, r.content)
+    return r
+
+
+def frame(provider: str, key: str, fetch: Callable[[], pd.DataFrame], start: str | None = None, end: str | None = None) -> pd.DataFrame:
+    # Providers reached through a client library (FRED, Yahoo) are mirrored as frames keyed without the date
+    # window: recordings of the same key are merged, and a replay returns the rows within [start, end].
+    if mode() == "replay":
+        entry = _read(provider, key)
+        if entry is None:
+            raise _replay_miss(provider, key)
+        header, body = entry
+        _inject(provider, key, header.get("seconds", 0.0))
+        out = pd.read_parquet(io.BytesIO(body))
+        out = out[out.index >= pd.Timestamp(start)] if start else out
+        return out[out.index <= pd.Timestamp(end)] if end else out
+    t0 = time.perf_counter()
+    df = fetch()
+    if mode() == "record" and df is not None and not df.empty:
+        seconds = time.perf_counter() - t0
+        with _FRAME_LOCK:
+            try:
+                old = _read(provider, key)
+                merged = df if old is None else df.combine_first(pd.read_parquet(io.BytesIO(old[1])))
+                buf = io.BytesIO()
+                merged.to_parquet(buf)
+            except Exception as e:
+                _write_failed(provider, key, e)
+            else:
+                _write(provider, key, {"kind": "frame", "seconds": seconds}, buf.getvalue())
+    return df
+
+
+def entries() -> pd.DataFrame:
+    rows = []
+    for path in sorted(_root().glob("*/*.gz")):
+        entry = _read_file(path)
+        if entry is not None:
+            header, body = entry
+            rows.append({"provider": header.get("provider"), "key": header.get("key"), "kind": header.get("kind"), "bytes": len(body),
+                         "stored_bytes": path.stat().st_size, "seconds": header.get("seconds"), "recorded_at": header.get("recorded_at")})
+    return pd.DataFrame(rows, columns=["provider", "key", "kind", "bytes", "stored_bytes", "seconds", "recorded_at"])
+
+
+def pack(archive: str) -> int:
+    # entries are gzip already: a plain tar keeps them as-is
+    files = sorted(_root().glob("*/*.gz"))
+    with tarfile.open(archive, "w") as tar:
+        for f in files:
+            tar.add(f, arcname=str(f.relative_to(_root())))
+    return len(files)
+
+
+def unpack(archive: str) -> int:
+    # only plain *.gz files below the mirror root; the "data" filter also refuses links and escaping paths
+    with tarfile.open(archive, "r") as tar:
+        members = [m for m in tar.getmembers() if m.isfile() and m.name.endswith(".gz") and not Path(m.name).is_absolute() and ".." not in Path(m.name).parts]
+        tar.extractall(_root(), members=members, filter="data")
+    return len(members)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Inspect, pack and unpack the provider record/replay mirror.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="summarise recorded entries per provider")
+    sub.add_parser("pack", help="bundle the mirror into a tar archive").add_argument("archive")
+    sub.add_parser("unpack", help="extract a tar archive into the mirror").add_argument("archive")
+    args = parser.parse_args()
+    if args.cmd == "pack":
+        print(f"packed {pack(args.archive)} entries from {_root()} into {args.archive}")
+    elif args.cmd == "unpack":
+        print(f"unpacked {unpack(args.archive)} entries into {_root()}")
+    else:
+        df = entries()
+        if df.empty:
+            print(f"mirror {_root()} is empty")
+            return 0
+        summary = df.groupby("provider").agg(entries=("key", "size"), bytes=("bytes", "sum"), stored_bytes=("stored_bytes", "sum"), p50_s=("seconds", "median"))
+        print(summary.to_string())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
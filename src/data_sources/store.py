@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from src.config import SERIES_STORE_DIR, SERIES_STORE_FULL_REFRESH_DAYS, SERIES_STORE_MAX_AGE_HOURS, SERIES_STORE_TAIL_OVERLAP_DAYS
+from src.instrument import cache_event
+
+FULL_HISTORY_START = "1900-01-01"
+
+Fetcher = Callable[[str, "str | None"], pd.DataFrame]
+
+
+def _now() -> pd.Timestamp:
+    return pd.Timestamp.utcnow().tz_localize(None)
+
+
+def _paths(source: str, series_id: str) -> tuple[Path, Path]:
+    root = Path(os.environ.get("CAM_SERIES_STORE", SERIES_STORE_DIR))
+    slug = re.sub(r"[^A-Za-z0-9_-]+", "_", series_id).strip("_")[:80]
+    digest = hashlib.sha1(series_id.encode("utf-8")).hexdigest()[:10]
+    base = root / source.upper() / f"{slug}-{digest}"
+    return Path(f"{base}.parquet"), Path(f"{base}.json")
+
+
+def _clean(df: pd.DataFrame | None) -> pd.DataFrame:
+    if df is None or df.empty or "value" not in df.columns:
+        return pd.DataFrame(columns=["value"])
+    out = df[["value"]].copy()
+    out.index = pd.to_datetime(out.index, errors="coerce")
+    out["value"] = pd.to_numeric(out["value"], errors="coerce")
+    out = out[out.index.notna()].dropna()
+    return out[~out.index.duplicated(keep="last")].sort_index()
+
+
+def _window(df: pd.DataFrame, start: str, end: str | None) -> pd.DataFrame:
+    out = df[df.index >= pd.Timestamp(start)]
+    return out[out.index <= pd.Timestamp(end)] if end else out
+
+
+def read_series(source: str, series_id: str) -> tuple[pd.DataFrame, dict]:
+    data_path, meta_path = _paths(source, series_id)
+    try:
+        return _clean(pd.read_parquet(data_path)), json.loads(meta_path.read_text(encoding="utf-8"))
+    except Exception:
+        return pd.DataFrame(columns=["value"]), {}
+
+
+def write_series(source: str, series_id: str, df: pd.DataFrame, meta: dict) -> None:
+    data_path, meta_path = _paths(source, series_id)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(f"{data_path}{suffix}")
+        df.to_parquet(tmp)
+        os.replace(tmp, data_path)
+        tmp = Path(f"{meta_path}{suffix}")
+        tmp.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp, meta_path)
+    except Exception:
+        pass
+
+
+def cached_series(source: str, series_id: str, start: str, end: str | None, fetch: Fetcher, incremental: bool = True) -> pd.DataFrame:
+    # Serve (source, series_id) from the on-disk store. Within SERIES_STORE_MAX_AGE_HOURS no request is made;
+    # afterwards only the tail since the last observation (minus an overlap for revisions) is fetched, and the
+    # whole history is re-pulled every SERIES_STORE_FULL_REFRESH_DAYS or when an earlier start is requested.
+    stored, meta = read_series(source, series_id)
+    now = _now()
+    if not stored.empty and meta:
+        last_obs = stored.index.max()
+        covered = pd.Timestamp(meta.get("start", start)) <= pd.Timestamp(start)
+        fresh = now - pd.Timestamp(meta.get("last_fetch", "1970-01-01")) < pd.Timedelta(hours=SERIES_STORE_MAX_AGE_HOURS)
+        if covered and (fresh or (end and pd.Timestamp(end) <= last_obs)):
+            cache_event("series_store", hit=True, source=source)
+            return _window(stored, start, end)
+        full_due = not covered or not incremental or now - pd.Timestamp(meta.get("last_full", "1970-01-01")) > pd.Timedelta(days=SERIES_STORE_FULL_REFRESH_DAYS)
+    else:
+        full_due = True
+
+    cache_event("series_store", hit=False, source=source, full=full_due)
+    if full_due:
+        fetch_start = min(pd.Timestamp(start), pd.Timestamp(meta.get("start", start))).strftime("%Y-%m-%d")
+    else:
+        fetch_start = max(pd.Timestamp(meta["start"]), last_obs - pd.Timedelta(days=SERIES_STORE_TAIL_OVERLAP_DAYS)).strftime("%Y-%m-%d")
+    try:
+        new = _clean(fetch(fetch_start, end))
+    except Exception:
+        new = pd.DataFrame(columns=["value"])
+    if new.empty:
+        # provider down or no data (a healthy tail fetch returns at least the overlap): keep whatever we have and
+        # leave last_fetch alone, so the next call retries
+        return _window(stored, start, end)
+
+    merged = new if stored.empty else new.combine_first(stored)
+    meta = {
+        "source": source, "series_id": series_id,
+        "start": min(pd.Timestamp(start), pd.Timestamp(meta.get("start", start))).strftime("%Y-%m-%d"),
+        "last_obs": merged.index.max().strftime("%Y-%m-%d"),
+        "last_fetch": now.isoformat(),
+        "last_full": now.isoformat() if full_due else meta.get("last_full", now.isoformat()),
+    }
+    write_series(source, series_id, merged, meta)
+    return _window(merged, start, end)
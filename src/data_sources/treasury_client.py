@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import io
+
+import pandas as pd
+
+from src.data_sources.http_client import get as http_get
+from src.instrument import cache_data
+
+URL = "https://home.treasury.gov/resource-center/data-chart-center/interest-rates/DailyTreasuryYieldCurveRateData.csv"
+
+# Treasury CSV column -> FRED-style code used by CONCEPT_PRIORITY ("TREASURY:DGS10"), with maturity in years
+TENORS = {
+    "1 Mo": ("DGS1MO", 1 / 12), "2 Mo": ("DGS2MO", 2 / 12), "3 Mo": ("DGS3MO", 0.25), "4 Mo": ("DGS4MO", 4 / 12),
+    "6 Mo": ("DGS6MO", 0.5), "1 Yr": ("DGS1", 1.0), "2 Yr": ("DGS2", 2.0), "3 Yr": ("DGS3", 3.0), "5 Yr": ("DGS5", 5.0),
+    "7 Yr": ("DGS7", 7.0), "10 Yr": ("DGS10", 10.0), "20 Yr": ("DGS20", 20.0), "30 Yr": ("DGS30", 30.0),
+}
+TENOR_YEARS = {code: years for code, years in TENORS.values()}
+
+
+@cache_data(ttl=21600, show_spinner=False)
+def fetch_treasury_curve() -> pd.DataFrame:
+    # Download and parse the par yield curve file once into a (date x tenor) matrix, columns ordered by maturity.
+    # Failures raise so st.cache_data does not keep them; treasury_series turns them into an empty frame.
+    raw = pd.read_csv(io.StringIO(http_get(URL, timeout=15, label="Treasury").text))
+    if "Date" not in raw.columns:
+        raise RuntimeError("Treasury fetch failed: no Date column in the yield curve file")
+    raw["Date"] = pd.to_datetime(raw["Date"], errors="coerce")
+    cols = [c for c in TENORS if c in raw.columns]
+    curve = raw.dropna(subset=["Date"]).set_index("Date")[cols].apply(pd.to_numeric, errors="coerce")
+    curve.columns = [TENORS[c][0] for c in cols]
+    curve.index.name = "date"
+    curve = curve[~curve.index.duplicated(keep="last")].sort_index().dropna(how="all")
+    if curve.empty:
+        raise RuntimeError("Treasury fetch failed: no yields in the yield curve file")
+    return curve[sorted(curve.columns, key=TENOR_YEARS.get)]
+
+
+def treasury_series(code: str, start: str, end: str | None = None) -> pd.DataFrame:
+    try:
+        curve = fetch_treasury_curve()
+    except Exception:
+        return pd.DataFrame(columns=["value"])
+    if code not in curve.columns:
+        return pd.DataFrame(columns=["value"])
+    out = curve[[code]].rename(columns={code: "value"}).dropna()
+    out = out[out.index >= pd.Timestamp(start)]
+    return out[out.index <= pd.Timestamp(end)] if end else out
+
+
+def curve_slope(curve: pd.DataFrame, short: str = "DGS2", long: str = "DGS10") -> pd.Series:
+    if short not in curve.columns or long not in curve.columns:
+        return pd.Series(dtype=float)
+    return (curve[long] - curve[short]).rename(f"{long}-{short}")
+
+
+def curve_butterfly(curve: pd.DataFrame, short: str = "DGS2", belly: str = "DGS5", long: str = "DGS10") -> pd.Series:
+    if any(c not in curve.columns for c in (short, belly, long)):
+        return pd.Series(dtype=float)
+    return (2 * curve[belly] - curve[short] - curve[long]).rename(f"{short}/{belly}/{long}")
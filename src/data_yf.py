@@ -1,16 +1,33 @@
 from __future__ import annotations
+import time
+from functools import partial
 import pandas as pd
-import streamlit as st
-import yfinance as yf
 from src.config import ALLOWED_TICKERS
+from src.data_sources import mirror
+from src.instrument import cache_data, record
 
 
-@st.cache_data(ttl=21600)
+def _download(tickers: list[str], start: str) -> pd.DataFrame:
+    import yfinance as yf  # heavy import, deferred to first download
+
+    return yf.download(tickers=tickers, start=start, auto_adjust=True, progress=False, threads=True, timeout=20)
+
+
+@cache_data(ttl=21600)
 def fetch_prices(tickers: list[str], start: str) -> pd.DataFrame:
     bad = [t for t in tickers if t not in ALLOWED_TICKERS]
     if bad:
         raise ValueError(f"Forbidden tickers: {bad}")
-    data = yf.download(tickers=tickers, start=start, auto_adjust=True, progress=False, threads=True, timeout=20)
+
+    t0 = time.perf_counter()
+    try:
+        data = mirror.frame("Yahoo", ",".join(sorted(tickers)), partial(_download, tickers, start), start)
+    except RuntimeError:
+        # replay miss or injected failure: what yfinance returns when Yahoo is down
+        data = pd.DataFrame()
+    # yfinance hides the responses; bytes are the downloaded frame
+    record("request", provider="Yahoo", host="query1.finance.yahoo.com", status=200 if not data.empty else None, ok=not data.empty,
+           seconds=time.perf_counter() - t0, bytes=int(data.memory_usage(deep=False).sum()), retries=0, mirror=mirror.mode())
     if data.empty:
         return pd.DataFrame()
     px = data["Close"] if isinstance(data.columns, pd.MultiIndex) else data.to_frame(name=tickers[0])
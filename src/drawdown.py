@@ -0,0 +1,114 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+
+EPISODE_COLUMNS = ["ticker", "peak", "trough", "recovery", "depth", "days_to_trough", "days_to_recovery", "duration_days"]
+
+
+def drawdown(px: pd.DataFrame) -> pd.DataFrame:
+    # distance from the running high; NaN before the first price and on missing bars, like px / px.cummax() - 1
+    a = px.to_numpy(dtype=float)
+    return pd.DataFrame(a / np.fmax.accumulate(a, axis=0) - 1, index=px.index, columns=px.columns)
+
+
+def _rolling_min(a: np.ndarray, window: int) -> np.ndarray:
+    # van Herk/Gil-Werman: per-block prefix and suffix minima give every window's min in O(n) per column,
+    # vectorized over columns; NaN wherever the window is incomplete or holds a NaN (rolling(window).min())
+    T, N = a.shape
+    out = np.full((T, N), np.nan)
+    if T < window:
+        return out
+    blocks = -(-T // window)
+    missing = np.isnan(a)
+    x = np.full((blocks * window, N), np.inf)
+    x[:T] = a
+    x[:T][missing] = np.inf
+    x = x.reshape(blocks, window, N)
+    prefix = np.minimum.accumulate(x, axis=1).reshape(-1, N)
+    suffix = np.minimum.accumulate(x[:, ::-1], axis=1)[:, ::-1].reshape(-1, N)
+    out[window - 1 :] = np.minimum(suffix[: T - window + 1], prefix[window - 1 : T])
+    gappy = np.flatnonzero(missing.any(axis=0))
+    if len(gappy):
+        valid = np.vstack([np.zeros((1, len(gappy))), np.cumsum(~missing[:, gappy], axis=0)])
+        tail = out[window - 1 :, gappy]
+        tail[valid[window:] - valid[: T - window + 1] < window] = np.nan
+        out[window - 1 :, gappy] = tail
+    return out
+
+
+def rolling_min(df: pd.DataFrame, window: int) -> pd.DataFrame:
+    return pd.DataFrame(_rolling_min(df.to_numpy(dtype=float), window), index=df.index, columns=df.columns)
+
+
+@dataclass
+class DrawdownAnalytics:
+    drawdown: pd.DataFrame  # date x ticker, <= 0
+    rolling_mdd: pd.DataFrame  # worst drawdown within the trailing window
+    duration_days: pd.DataFrame  # calendar days since the last high (0 at a high)
+    episodes: pd.DataFrame  # one row per peak -> trough -> recovery episode, recovery NaT while still underwater
+
+    def summary(self) -> pd.DataFrame:
+        ep = self.episodes.dropna(subset=["recovery"]).groupby("ticker")["days_to_recovery"]
+        return pd.DataFrame({
+            "drawdown": self.drawdown.ffill().iloc[-1], "duration_days": self.duration_days.ffill().iloc[-1],
+            "rolling_mdd": self.rolling_mdd.ffill().iloc[-1], "max_drawdown": self.drawdown.min(),
+            "episodes": self.episodes.groupby("ticker").size(), "avg_days_to_recovery": ep.mean(),
+        }).reindex(self.drawdown.columns).rename_axis("ticker")
+
+
+def _last_high(a: np.ndarray) -> np.ndarray:
+    # row of the latest high (drawdown 0) at or before each row, -1 before the first
+    return np.maximum.accumulate(np.where(a == 0, np.arange(len(a))[:, None], -1), axis=0)
+
+
+def _duration(a: np.ndarray, last_high: np.ndarray, days: np.ndarray) -> np.ndarray:
+    return np.where(~np.isnan(a) & (last_high >= 0), days[:, None] - days[np.maximum(last_high, 0)], np.nan)
+
+
+def duration_days(dd: pd.DataFrame) -> pd.DataFrame:
+    # calendar days since the last high of an existing drawdown panel, without the episode pass
+    a = dd.to_numpy(dtype=float)
+    days = dd.index.values.astype("datetime64[D]").astype(np.int64)
+    return pd.DataFrame(_duration(a, _last_high(a), days), index=dd.index, columns=dd.columns)
+
+
+def analyze_drawdowns(px: pd.DataFrame, window: int = 756) -> DrawdownAnalytics:
+    # Every output from one set of linear passes over the (date x ticker) matrix: running max, last/next high
+    # by forward/backward accumulate, windowed min, and episode extents from the underwater runs.
+    dd = drawdown(px)
+    a = dd.to_numpy()
+    T, N = a.shape
+    row = np.arange(T)[:, None]
+    days = px.index.values.astype("datetime64[D]").astype(np.int64)
+    last_high = _last_high(a)
+    next_high = np.minimum.accumulate(np.where(a == 0, row, T)[::-1], axis=0)[::-1]
+    duration = _duration(a, last_high, days)
+
+    # underwater bars in ticker-major order; an episode is a run sharing the same last high
+    cols, rows = np.nonzero((a < 0).T)
+    if len(rows):
+        high = last_high[rows, cols]
+        key = cols.astype(np.int64) * T + high
+        starts = np.r_[0, np.flatnonzero(np.diff(key)) + 1]
+        lens = np.diff(np.r_[starts, len(key)])
+        vals = a[rows, cols]
+        depth = np.minimum.reduceat(vals, starts)
+        hit = np.flatnonzero(vals == np.repeat(depth, lens))
+        trough = rows[hit[np.searchsorted(hit, starts)]]
+        col, peak = cols[starts], high[starts]
+        rec = next_high[rows[starts + lens - 1], col]
+        recovered = rec < T
+        end = np.where(recovered, days[np.minimum(rec, T - 1)], days[-1])
+        episodes = pd.DataFrame({
+            "ticker": px.columns[col], "peak": px.index[peak], "trough": px.index[trough],
+            "recovery": pd.DatetimeIndex(np.where(recovered, px.index.values[np.minimum(rec, T - 1)], np.datetime64("NaT"))),
+            "depth": depth, "days_to_trough": days[trough] - days[peak],
+            "days_to_recovery": np.where(recovered, end - days[trough], np.nan), "duration_days": end - days[peak],
+        })
+    else:
+        episodes = pd.DataFrame(columns=EPISODE_COLUMNS)
+    return DrawdownAnalytics(
+        dd, pd.DataFrame(_rolling_min(a, window), index=px.index, columns=px.columns),
+        pd.DataFrame(duration, index=px.index, columns=px.columns), episodes,
+    )
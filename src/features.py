@@ -1,8 +1,19 @@
 from __future__ import annotations
+import copy
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
 import pandas as pd
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from src.config import FEATURE_ENGINE_MAX_ENTRIES
+from src.drawdown import drawdown, rolling_min
 from src.utils import to_monthly_last, annualized_vol, pct_rank
 
+VOL_WINDOWS = {"vol_1m": 21, "vol_3m": 63, "vol_12m": 252}
+MDD_WINDOW = 756
+PCT_WINDOW = 120
+
 
 def build_market_features(px: pd.DataFrame) -> dict[str, pd.DataFrame]:
     daily_ret = px.pct_change()
@@ -11,12 +22,287 @@ def build_market_features(px: pd.DataFrame) -> dict[str, pd.DataFrame]:
     vol_1m = daily_ret.rolling(21).std() * np.sqrt(252)
     vol_3m = daily_ret.rolling(63).std() * np.sqrt(252)
     vol_12m = daily_ret.rolling(252).std() * np.sqrt(252)
-    dd = px / px.cummax() - 1
-    rolling_mdd_36m = dd.rolling(756).min()
-    pct = monthly_ret.apply(pct_rank)
+    dd = drawdown(px)
+    rolling_mdd_36m = rolling_min(dd, MDD_WINDOW)
+    pct = pct_rank(monthly_ret)
     return {
         "px": px, "daily_ret": daily_ret, "monthly_px": monthly_px, "monthly_ret": monthly_ret,
         "vol_1m": vol_1m, "vol_3m": vol_3m, "vol_12m": vol_12m, "drawdown": dd,
         "rolling_mdd_36m": rolling_mdd_36m, "monthly_vol_12m": monthly_ret.apply(annualized_vol),
         "ret_pct": pct,
     }
+
+
+# lazily built features: name -> (dependencies, compute); "px" is the input itself
+FEATURE_SPECS: dict[str, tuple[tuple[str, ...], Callable[..., pd.DataFrame]]] = {
+    "daily_ret": (("px",), lambda px: px.pct_change()),
+    **{k: (("daily_ret",), lambda r, w=w: r.rolling(w).std() * np.sqrt(252)) for k, w in VOL_WINDOWS.items()},
+    "drawdown": (("px",), drawdown),
+    "rolling_mdd_36m": (("drawdown",), lambda dd: rolling_min(dd, MDD_WINDOW)),
+    "monthly_px": (("px",), to_monthly_last),
+    "monthly_ret": (("monthly_px",), lambda mpx: mpx.pct_change()),
+    "monthly_vol_12m": (("monthly_ret",), lambda mret: mret.apply(annualized_vol)),
+    "ret_pct": (("monthly_ret",), lambda mret: pct_rank(mret, PCT_WINDOW)),
+}
+DAILY_FEATURES = ["daily_ret", *VOL_WINDOWS, "drawdown", "rolling_mdd_36m"]
+MONTHLY_FEATURES = ["monthly_px", "monthly_ret", "monthly_vol_12m", "ret_pct"]
+# trailing-window features: costly to recompute over the whole history, so the features node seeds them from the engine
+WINDOW_FEATURES = [*VOL_WINDOWS, "rolling_mdd_36m", "ret_pct"]
+FEATURE_NAMES = ["px", "daily_ret", "monthly_px", "monthly_ret", *VOL_WINDOWS, "drawdown", "rolling_mdd_36m", "monthly_vol_12m", "ret_pct"]
+
+
+class FeatureBundle(Mapping):
+    # Read-only mapping with the keys of build_market_features that computes each feature (and its dependencies)
+    # on first access. Derived panels are stored as `dtype` in one (feature, date, ticker) block per frequency,
+    # allocated on first use (untouched slots never get resident pages); `px` is kept as given, i.e. shared with
+    # the caller. Pickles as the prices only, so cache/session copies stay small.
+
+    # `values` seeds already computed features (e.g. from a MarketFeatureEngine); they are stored as
+    # `dtype` like computed ones.
+
+    def __init__(self, px: pd.DataFrame, dtype: str | np.dtype = "float64", values: Mapping[str, pd.DataFrame] | None = None) -> None:
+        self.px = px
+        self.dtype = np.dtype(dtype)
+        self._values: dict[str, pd.DataFrame] = {"px": px}
+        self._blocks: dict[str, np.ndarray] = {}
+        for name, df in (values or {}).items():
+            if name in FEATURE_SPECS:
+                self._values[name] = self._store(name, df)
+
+    def __reduce__(self):
+        return type(self), (self.px, self.dtype.str)
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name in self._values:
+            return self._values[name]
+        if name not in FEATURE_SPECS:
+            raise KeyError(name)
+        self._values[name] = self._store(name, self._compute(name))
+        return self._values[name]
+
+    def _compute(self, name: str) -> pd.DataFrame:
+        # Features are always derived from float64 parents: below float64 a stored parent would be a rounded copy
+        # (float32 prices put ~1e-3 relative error into pct_change), so it is recomputed transiently from px and
+        # only the stored result is rounded.
+        deps, compute = FEATURE_SPECS[name]
+        exact = self.dtype == np.float64
+        return compute(*(self[d] if d == "px" or exact else self._compute(d) for d in deps))
+
+    def __iter__(self):
+        return iter(FEATURE_NAMES)
+
+    def __len__(self) -> int:
+        return len(FEATURE_NAMES)
+
+    def __repr__(self) -> str:
+        return f"FeatureBundle({self.px.shape[0]}x{self.px.shape[1]}, {self.dtype}, materialized={self.materialized})"
+
+    @property
+    def materialized(self) -> list[str]:
+        return [k for k in FEATURE_NAMES if k in self._values]
+
+    def _store(self, name: str, df: pd.DataFrame) -> pd.DataFrame:
+        freq, names = ("daily", DAILY_FEATURES) if name in DAILY_FEATURES else ("monthly", MONTHLY_FEATURES)
+        if freq not in self._blocks:
+            self._blocks[freq] = np.empty((len(names), len(df), df.shape[1]), dtype=self.dtype)
+        block = self._blocks[freq][names.index(name)]
+        block[:] = df.to_numpy(dtype=self.dtype, na_value=np.nan)
+        return pd.DataFrame(block, index=df.index, columns=df.columns, copy=False)
+
+    def materialize(self, names: list[str] | None = None) -> FeatureBundle:
+        for k in names or FEATURE_NAMES:
+            self[k]
+        return self
+
+    def memory_usage(self) -> pd.DataFrame:
+        # bytes per feature: `reserved` is its slot in an allocated block, `materialized` what is filled and held
+        rows = {}
+        for k in FEATURE_NAMES:
+            if k == "px":
+                reserved = int(self.px.memory_usage(index=False).sum())
+            else:
+                freq, names = ("daily", DAILY_FEATURES) if k in DAILY_FEATURES else ("monthly", MONTHLY_FEATURES)
+                reserved = self._blocks[freq][names.index(k)].nbytes if freq in self._blocks else 0
+            rows[k] = {"materialized": reserved if k in self._values else 0, "reserved": reserved}
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.memory_usage()["materialized"].sum())
+
+
+class _Rows:
+    # append-only 2D float buffer with amortized O(rows appended) growth
+    def __init__(self, values: np.ndarray) -> None:
+        self.buf = np.array(values, copy=True)
+        self.n = len(values)
+
+    def extend(self, rows: np.ndarray) -> None:
+        if self.n + len(rows) > len(self.buf):
+            grown = np.empty((max(2 * len(self.buf), self.n + len(rows)),) + self.buf.shape[1:], dtype=self.buf.dtype)
+            grown[: self.n] = self.buf[: self.n]
+            self.buf = grown
+        self.buf[self.n : self.n + len(rows)] = rows
+        self.n += len(rows)
+
+    def tail(self, k: int) -> np.ndarray:
+        return self.buf[max(0, self.n - k) : self.n]
+
+    def view(self) -> np.ndarray:
+        return self.buf[: self.n]
+
+
+def _window_tail(history: _Rows, new: np.ndarray, window: int) -> np.ndarray:
+    # (len(new), N, window) windows ending at each new row; missing history is NaN so incomplete windows yield NaN
+    ctx = np.vstack([history.tail(window - 1), new])
+    short = window - 1 + len(new) - len(ctx)
+    if short > 0:
+        ctx = np.vstack([np.full((short, ctx.shape[1]), np.nan), ctx])
+    return sliding_window_view(ctx, window, axis=0)
+
+
+def _last_window(history: np.ndarray, window: int) -> np.ndarray | None:
+    # (N, window) trailing window of a monthly buffer, None while history is shorter than the window
+    return history[-window:].T if len(history) >= window else None
+
+
+class MarketFeatureEngine:
+    # Stateful version of build_market_features: seeded by one full compute, then `update(new_px)` appends bars
+    # and updates every feature from window buffers and running state (last price, running max, previous
+    # month close) in O(window) per bar. Output matches a full recompute up to floating-point rounding.
+
+    def __init__(self, px: pd.DataFrame) -> None:
+        f = build_market_features(px)
+        self.columns = px.columns
+        self._index_name = px.index.name
+        self._dates = _Rows(px.index.values)
+        self._daily = {k: _Rows(f[k].to_numpy(dtype=float)) for k in ["px", "daily_ret", *VOL_WINDOWS, "drawdown", "rolling_mdd_36m"]}
+        self._months = _Rows(f["monthly_px"].index.values)
+        self._monthly = {k: _Rows(f[k].to_numpy(dtype=float)) for k in ["monthly_px", "monthly_ret", "monthly_vol_12m", "ret_pct"]}
+        closes = f["monthly_px"].ffill().to_numpy(dtype=float)
+        nan_row = np.full(len(px.columns), np.nan)
+        self._prev_close = closes[-2] if len(closes) >= 2 else nan_row
+        self._last_px = px.ffill().iloc[-1].to_numpy(dtype=float) if len(px) else nan_row
+        self._running_max = px.max().to_numpy(dtype=float)
+
+    @property
+    def last_date(self) -> pd.Timestamp:
+        return pd.Timestamp(self._dates.buf[self._dates.n - 1])
+
+    def sync(self, px: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        # Bring the engine up to a freshly downloaded `px`: append the bars after last_date when the known history
+        # is unchanged, otherwise (revisions, dividend/split re-adjustment, new tickers) rebuild from scratch.
+        known = px.loc[: self.last_date]
+        if list(px.columns) == list(self.columns) and len(known) == self._dates.n and np.allclose(known.to_numpy(dtype=float)[-1], self._daily["px"].tail(1)[0], equal_nan=True):
+            return self.update(px.loc[px.index > self.last_date])
+        self.__init__(px)
+        return self.features()
+
+    def update(self, new_px: pd.DataFrame) -> dict[str, pd.DataFrame]:
+        if new_px.empty:
+            return self.features()
+        if set(new_px.columns) - set(self.columns):
+            raise ValueError(f"New tickers need a full rebuild: {sorted(set(new_px.columns) - set(self.columns))}")
+        new_px = new_px.reindex(columns=self.columns).sort_index()
+        if self._dates.n and new_px.index[0] <= self.last_date:
+            raise ValueError(f"Bars must be after {self.last_date.date()}; got {new_px.index[0].date()}")
+        p = new_px.to_numpy(dtype=float)
+
+        # daily returns with pct_change's forward-fill semantics, seeded by the last valid price
+        filled = pd.DataFrame(np.vstack([self._last_px, p])).ffill().to_numpy()
+        ret = filled[1:] / filled[:-1] - 1
+
+        vols = {k: np.std(_window_tail(self._daily["daily_ret"], ret, w), axis=-1, ddof=1) * np.sqrt(252) for k, w in VOL_WINDOWS.items()}
+
+        running_max = np.fmax.accumulate(np.vstack([self._running_max, p]), axis=0)[1:]
+        dd = p / running_max - 1
+        self._running_max = running_max[-1]
+        mdd = _window_tail(self._daily["drawdown"], dd, MDD_WINDOW).min(axis=-1)
+
+        for k, rows in [("px", p), ("daily_ret", ret), *vols.items(), ("drawdown", dd), ("rolling_mdd_36m", mdd)]:
+            self._daily[k].extend(rows)
+        self._dates.extend(new_px.index.values)
+
+        month_ends = (new_px.index + pd.offsets.MonthEnd(0)).normalize()
+        for m in month_ends.unique():
+            rows = np.flatnonzero(month_ends == m)
+            self._update_month(m, p[rows], filled[rows[-1] + 1])
+        return self.features()
+
+    def _update_month(self, month_end: pd.Timestamp, block: np.ndarray, close: np.ndarray) -> None:
+        # `block` are the new raw bars of the month, `close` the forward-filled price after its last bar
+        last_valid = pd.DataFrame(block).ffill().to_numpy()[-1]
+        same_month = self._months.n and pd.Timestamp(self._months.buf[self._months.n - 1]) == month_end
+        if same_month:
+            row = self._monthly["monthly_px"].buf[self._months.n - 1]
+            row[:] = np.where(np.isnan(last_valid), row, last_valid)
+        else:
+            self._prev_close = self._last_px
+            if np.isnan(last_valid).all():
+                # to_monthly_last drops all-NaN months
+                self._last_px = close
+                return
+            self._months.extend(np.array([month_end.to_datetime64()]))
+            self._monthly["monthly_px"].extend(last_valid[None, :])
+            for k in ["monthly_ret", "monthly_vol_12m", "ret_pct"]:
+                self._monthly[k].extend(np.full((1, len(close)), np.nan))
+        self._last_px = close
+        i = self._months.n - 1
+        mret = self._monthly["monthly_ret"].buf
+        mret[i] = close / self._prev_close - 1
+        w = _last_window(mret[: i + 1], 12)
+        self._monthly["monthly_vol_12m"].buf[i] = np.nan if w is None else np.std(w, axis=-1, ddof=1) * np.sqrt(12)
+        w = _last_window(mret[: i + 1], PCT_WINDOW)
+        if w is None:
+            self._monthly["ret_pct"].buf[i] = np.nan
+        else:
+            # rolling rank(pct=True) of the latest value, average ties; NaN propagates like min_periods=window
+            last = w[:, -1:]
+            pct = ((w < last).sum(axis=-1) + ((w == last).sum(axis=-1) + 1) / 2) / PCT_WINDOW * 100
+            self._monthly["ret_pct"].buf[i] = np.where(np.isnan(w).any(axis=-1), np.nan, np.clip(pct, 0, 100))
+
+    def features(self) -> dict[str, pd.DataFrame]:
+        idx = pd.DatetimeIndex(self._dates.view(), name=self._index_name)
+        midx = pd.DatetimeIndex(self._months.view(), name=self._index_name)
+        out = {k: pd.DataFrame(v.view(), index=idx, columns=self.columns, copy=False) for k, v in self._daily.items()}
+        out.update({k: pd.DataFrame(v.view(), index=midx, columns=self.columns, copy=False) for k, v in self._monthly.items()})
+        return {k: out[k] for k in ["px", "daily_ret", "monthly_px", "monthly_ret", "vol_1m", "vol_3m", "vol_12m", "drawdown", "rolling_mdd_36m", "monthly_vol_12m", "ret_pct"]}
+
+
+# one engine per (tickers, first date, last date): a refreshed download branches off the engine of the same universe
+# and start with the latest earlier end date and only appends bars, leaving that engine to sessions still pinned to it
+_ENGINES: OrderedDict[tuple, MarketFeatureEngine] = OrderedDict()
+_ENGINES_LOCK = threading.Lock()
+
+
+def incremental_features(px: pd.DataFrame, dtype: str | np.dtype = "float64", names: list[str] | None = None) -> dict[str, pd.DataFrame]:
+    # build_market_features(px) (or its `names` subset) as `dtype`, computed by appending to the engine of an earlier download of the
+    # same universe when its history is unchanged; the frames are copied out of the engine buffers under the lock
+    if px.empty:
+        return {}
+    universe, end = (tuple(px.columns), px.index[0]), px.index[-1]
+    with _ENGINES_LOCK:
+        engine = _ENGINES.pop((*universe, end), None)
+        if engine is None:
+            earlier = [k for k in _ENGINES if k[:2] == universe and k[2] < end]
+            engine = copy.deepcopy(_ENGINES[max(earlier, key=lambda k: k[2])]) if earlier else None
+        out = engine.sync(px) if engine is not None else (engine := MarketFeatureEngine(px)).features()
+        _ENGINES[(*universe, end)] = engine
+        while len(_ENGINES) > FEATURE_ENGINE_MAX_ENTRIES:
+            _ENGINES.popitem(last=False)
+        return {k: out[k].astype(dtype) for k in names or out}
+
+
+def engine_drift(px: pd.DataFrame, new_bars: int = 21) -> pd.Series:
+    # max abs difference per feature between an engine seeded without the last `new_bars` bars and then updated,
+    # and a full recompute of px (NaN placement must match too: a mismatch counts as inf)
+    engine = MarketFeatureEngine(px.iloc[:-new_bars])
+    inc, full = engine.update(px.iloc[-new_bars:]), build_market_features(px)
+    drift = {}
+    for k, ref in full.items():
+        a, b = inc[k].to_numpy(dtype=float), ref.to_numpy(dtype=float)
+        if a.shape != b.shape or not (np.isnan(a) == np.isnan(b)).all():
+            drift[k] = np.inf
+        else:
+            drift[k] = float(np.nanmax(np.abs(a - b), initial=0.0))
+    return pd.Series(drift, name="max_abs_diff")
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import sys
+import threading
+import uuid
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import pandas as pd
+
+from src.config import INSTRUMENT_MAX_EVENTS, INSTRUMENT_MAX_SESSIONS
+
+# Process-wide metrics: every stage span, provider request and cache lookup is appended to a bounded event log.
+# Events carry wall-clock `ts` (seconds since the epoch) and, inside a Streamlit session, the `session` id and
+# the `run` id of that session's latest begin_run(), so one rerun can be sliced out while other sessions are
+# running (worker threads carry the session through the script context the executor binds).
+# With CAM_METRICS_LOG set, each event is also appended to that file as a JSON line.
+_EVENTS: deque[dict] = deque(maxlen=INSTRUMENT_MAX_EVENTS)
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_RUNS: dict[str, str] = {}
+# frames of the stages open on any thread while tracemalloc traces (see stage)
+_OPEN: list[dict] = []
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+
+def _rss_peak_mb() -> float | None:
+    # process high-water mark (ru_maxrss is KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else None
+
+
+def session_id() -> str | None:
+    # only look for a script context once Streamlit is loaded; headless runs have no session
+    if "streamlit" not in sys.modules:
+        return None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+    except Exception:
+        return None
+    return ctx.session_id if ctx is not None else None
+
+
+def begin_run() -> str:
+    # new run id for the calling session; later events of the session (any thread) carry it
+    run = uuid.uuid4().hex
+    session = session_id() or ""
+    with _LOCK:
+        _RUNS.pop(session, None)
+        _RUNS[session] = run
+        while len(_RUNS) > INSTRUMENT_MAX_SESSIONS:
+            _RUNS.pop(next(iter(_RUNS)))
+    return run
+
+
+def record(event: str, **fields: Any) -> dict:
+    session = session_id()
+    entry = {"event": event, "ts": time.time(), "thread": threading.current_thread().name, "session": session, "run": _RUNS.get(session or ""), **fields}
+    with _LOCK:
+        _EVENTS.append(entry)
+    path = os.environ.get("CAM_METRICS_LOG")
+    if path:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+        except OSError:
+            pass
+    return entry
+
+
+def events(since: float | None = None, kind: str | None = None, run: str | None = None, session: str | None = None) -> list[dict]:
+    with _LOCK:
+        out = list(_EVENTS)
+    return [
+        e for e in out
+        if (since is None or e["ts"] >= since) and (kind is None or e["event"] == kind)
+        and (run is None or e.get("run") == run) and (session is None or e.get("session") == session)
+    ]
+
+
+def reset() -> None:
+    with _LOCK:
+        _EVENTS.clear()
+
+
+@contextmanager
+def stage(name: str, kind: str = "compute", **fields: Any):
+    # Wall time of the block plus memory: growth of the process RSS high-water mark and, while tracemalloc is
+    # tracing (e.g. `python -X tracemalloc`), the peak traced allocation above the level at entry. The traced
+    # peak is process-wide and reset per stage, so it is only reported for stages that no stage on another
+    # thread overlapped (concurrent fetch stages leave it out). Nested stages on the same thread report their parent.
+    stack = _LOCAL.__dict__.setdefault("stages", [])
+    tracing = tracemalloc.is_tracing()
+    frame = {"name": name, "traced_peak": 0, "thread": threading.get_ident(), "shared": False}
+    if tracing:
+        with _LOCK:
+            others = [f for f in _OPEN if f["thread"] != frame["thread"]]
+            for f in others:
+                f["shared"] = True
+            frame["shared"] = bool(others)
+            _OPEN.append(frame)
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1]["traced_peak"] = max(stack[-1]["traced_peak"], peak)
+        tracemalloc.reset_peak()
+        frame["traced_start"] = current
+    parent = stack[-1]["name"] if stack else None
+    stack.append(frame)
+    rss0, t0, start = _rss_peak_mb(), time.perf_counter(), time.time()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        stack.pop()
+        rss1 = _rss_peak_mb()
+        mem = {"rss_peak_mb": rss1, "rss_growth_mb": rss1 - rss0 if rss0 is not None else None}
+        if tracing:
+            with _LOCK:
+                _OPEN.remove(frame)
+        if tracing and tracemalloc.is_tracing():
+            peak = max(frame["traced_peak"], tracemalloc.get_traced_memory()[1])
+            if not frame["shared"]:
+                mem["traced_peak_mb"] = (peak - frame["traced_start"]) / 2**20
+            if stack:
+                stack[-1]["traced_peak"] = max(stack[-1]["traced_peak"], peak)
+                stack[-1]["shared"] |= frame["shared"]
+        record("stage", name=name, kind=kind, parent=parent, start=start, seconds=seconds, error=error, **mem, **fields)
+
+
+def timed(name: str | None = None, kind: str = "compute") -> Callable:
+    def wrap(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            with stage(name or fn.__name__, kind):
+                return fn(*args, **kwargs)
+        return run
+    return wrap
+
+
+def cache_event(cache: str, hit: bool, **fields: Any) -> None:
+    record("cache", cache=cache, hit=hit, **fields)
+
+
+def cache_data(**kwargs: Any) -> Callable:
+    # st.cache_data that also records a hit or miss per call: the wrapped body only runs on a miss
+    import streamlit as st
+
+    def wrap(fn: Callable) -> Callable:
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def body(*args, **kw):
+            _LOCAL.cache_calls[-1] = True
+            return fn(*args, **kw)
+
+        cached = st.cache_data(**kwargs)(body)
+
+        @functools.wraps(fn)
+        def call(*args, **kw):
+            calls = _LOCAL.__dict__.setdefault("cache_calls", [])
+            calls.append(False)
+            try:
+                return cached(*args, **kw)
+            finally:
+                cache_event("st.cache_data", hit=not calls.pop(), function=name)
+
+        call.clear = cached.clear
+        return call
+    return wrap
+
+
+def stage_table(evts: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame([e for e in evts if e["event"] == "stage"])
+    if df.empty:
+        return pd.DataFrame(columns=["name", "kind", "calls", "total_s", "max_s", "errors", "rss_growth_mb", "traced_peak_mb"])
+    if "traced_peak_mb" not in df.columns:
+        df["traced_peak_mb"] = float("nan")
+    return df.groupby(["name", "kind"], as_index=False).agg(
+        calls=("seconds", "size"), total_s=("seconds", "sum"), max_s=("seconds", "max"), errors=("error", "count"),
+        rss_growth_mb=("rss_growth_mb", "max"), traced_peak_mb=("traced_peak_mb", "max"),
+    ).sort_values("total_s", ascending=False, ignore_index=True)
+
+
+def provider_table(evts: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame([e for e in evts if e["event"] == "request"])
+    if df.empty:
+        return pd.DataFrame(columns=["provider", "requests", "errors", "retries", "not_modified", "bytes", "p50_s", "p95_s", "total_s"])
+    return df.groupby("provider", as_index=False).agg(
+        requests=("seconds", "size"), errors=("ok", lambda s: int((~s.astype(bool)).sum())), retries=("retries", "sum"),
+        not_modified=("status", lambda s: int((s == 304).sum())), bytes=("bytes", "sum"),
+        p50_s=("seconds", "median"), p95_s=("seconds", lambda s: s.quantile(0.95)), total_s=("seconds", "sum"),
+    ).sort_values("total_s", ascending=False, ignore_index=True)
+
+
+def cache_table(evts: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame([e for e in evts if e["event"] == "cache"])
+    if df.empty:
+        return pd.DataFrame(columns=["cache", "hits", "misses", "hit_rate"])
+    out = df.groupby("cache", as_index=False).agg(hits=("hit", "sum"), misses=("hit", lambda s: int((~s.astype(bool)).sum())))
+    out["hit_rate"] = out["hits"] / (out["hits"] + out["misses"])
+    return out
+
+
+def to_jsonl(evts: list[dict]) -> str:
+    return "".join(json.dumps(e, default=str) + "\n" for e in evts)
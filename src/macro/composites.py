@@ -1,24 +1,62 @@
 from __future__ import annotations
 
+import numpy as np
 import pandas as pd
 
+from src.macro.tidy import OBS_COLUMNS
 
-def build_composites(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
-    if df.empty:
-        return pd.DataFrame(), pd.DataFrame()
-    x = df.copy()
-    x["contribution"] = x["value_t"] * x["weight"]
-    grp = x.groupby(["date", "country", "pillar", "type", "timing"], as_index=False)["contribution"].sum()
 
-    comp = grp.pivot_table(index="date", columns=["country", "pillar"], values="contribution")
-    comp.columns = [f"{c[0]}|{c[1]}" for c in comp.columns]
+def _membership(meta: pd.DataFrame, keys: list[str]):
+    # sparse (indicator x bucket) 0/1 matrix and the sorted bucket labels
+    from scipy import sparse  # heavy import, deferred to the first composite build
+
+    codes, buckets = pd.factorize(pd.MultiIndex.from_frame(meta[keys]), sort=True)
+    m = sparse.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)), shape=(len(codes), len(buckets)))
+    return m, buckets.set_names(keys)
+
+
+def _ratio(num, den) -> np.ndarray:
+    num, den = num.toarray(), den.toarray()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(den > 0, num / np.where(den > 0, den, 1), np.nan)
+
+
+def composite_matrix(obs: pd.DataFrame):
+    # Sparse (date x indicator) matrices over the union of native observation dates, one stored cell per observation:
+    # weighted contribution (NaN as 0), non-NaN flag and row presence; indicator columns follow the `id` categories.
+    from scipy import sparse  # heavy import, deferred to the first composite build
+
+    ids, dates = obs["id"].cat.codes.to_numpy(), pd.factorize(obs["date"], sort=True)
+    value = obs["value_t"].to_numpy(dtype=float)
+    shape, cells = (len(dates[1]), len(obs["id"].cat.categories)), (dates[0], ids)
+    return pd.DatetimeIndex(dates[1], name="date"), *(sparse.csr_matrix((data, cells), shape=shape) for data in [np.nan_to_num(value), (~np.isnan(value)).astype(float), np.ones(len(value))])
+
+
+def build_composites(obs: pd.DataFrame, dims: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # Composites at native frequency as products of the sparse value matrix with sparse bucket-membership
+    # matrices: country|pillar is the mean over (type, timing) sub-buckets of their weighted sums, country|type
+    # and country|timing the mean weighted value. Use align_composites for a calendar-aligned view.
+    # Returns the composites and the narrow observations with their `contribution` (value_t x weight).
+    if obs.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    meta = dims.reindex(obs["id"].cat.categories)
+    dates, values, valid, present = composite_matrix(obs)
+    contrib = values.multiply(meta["weight"].to_numpy(dtype=float)).tocsr()
+    sub, sub_keys = _membership(meta, ["country", "pillar", "type", "timing"])
+    pillar, pillar_keys = _membership(sub_keys.to_frame(index=False), ["country", "pillar"])
+    # like groupby-sum, a sub-bucket whose rows are all NaN counts as 0 in the pillar mean
+    sub_present = (present @ sub > 0).astype(float)
+    parts = [(_ratio((contrib @ sub).multiply(sub_present) @ pillar, sub_present @ pillar), pillar_keys)]
+    for key in ["type", "timing"]:
+        m, buckets = _membership(meta, ["country", key])
+        parts.append((_ratio(contrib @ m, valid @ m), buckets))
 
-    hs = x.groupby(["date", "country", "type"], as_index=False)["contribution"].mean().pivot_table(index="date", columns=["country", "type"], values="contribution")
-    hs.columns = [f"{c[0]}|{c[1]}" for c in hs.columns]
+    out = pd.concat([pd.DataFrame(a, index=dates, columns=[f"{c}|{k}" for c, k in keys]) for a, keys in parts], axis=1)
+    weight = meta["weight"].to_numpy(dtype=float)[obs["id"].cat.codes.to_numpy()]
+    return out.dropna(axis=1, how="all"), obs[OBS_COLUMNS].assign(contribution=obs["value_t"].to_numpy() * weight)
 
-    timing = x.groupby(["date", "country", "timing"], as_index=False)["contribution"].mean().pivot_table(index="date", columns=["country", "timing"], values="contribution")
-    timing.columns = [f"{c[0]}|{c[1]}" for c in timing.columns]
 
-    out = comp.join(hs, how="outer").join(timing, how="outer").sort_index().resample("D").ffill()
-    contrib = x[["date", "country", "display_name", "type", "timing", "weight", "value_t", "contribution", "source"]].copy()
-    return out, contrib
+def align_composites(comp: pd.DataFrame, freq: str | None = "D", start=None, end=None) -> pd.DataFrame:
+    # forward-fill each composite from its own observations, cut to [start, end], then upsample to `freq` if given
+    out = comp.ffill().loc[start:end]
+    return out.resample(freq).ffill() if freq and not out.empty else out
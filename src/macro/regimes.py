@@ -1,33 +1,65 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
+
 import numpy as np
 import pandas as pd
 
+REGIME_CENTERS = {
+    "Reflation": (1.0, 1.0),
+    "Goldilocks": (1.0, -1.0),
+    "Stagflation": (-1.0, 1.0),
+    "Slowdown": (-1.0, -1.0),
+}
+REGIMES = list(REGIME_CENTERS)
+
 
 def _softmax(v: np.ndarray) -> np.ndarray:
-    e = np.exp(v - np.max(v, axis=1, keepdims=True))
-    return e / e.sum(axis=1, keepdims=True)
+    e = np.exp(v - np.max(v, axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+def regime_probability_cube(z: np.ndarray, sigma: float | Sequence[float] = 1.0, centers: dict[str, tuple[float, float]] | None = None) -> np.ndarray:
+    # z is (..., 2) growth/inflation z-scores, e.g. (date x country x 2). Returns probabilities in % with shape
+    # (..., regime), or (..., sigma, regime) for a sigma grid; NaN wherever either input is missing.
+    c = np.asarray(list((centers or REGIME_CENTERS).values()), dtype=float)
+    d2 = ((np.asarray(z, dtype=float)[..., None, :] - c) ** 2).sum(axis=-1)
+    s = np.asarray(sigma, dtype=float)
+    scores = -d2 / (2 * s * s) if s.ndim == 0 else -d2[..., None, :] / (2 * s[:, None] ** 2)
+    return _softmax(scores) * 100
+
+
+def batch_regime_probabilities(
+    composites: pd.DataFrame, countries: Sequence[str] | None = None, sigma: float | Sequence[float] = 1.0,
+    centers: dict[str, tuple[float, float]] | None = None,
+) -> pd.DataFrame:
+    # All countries (and sigmas) in one pass from the `{country}|GROWTH` / `{country}|INFLATION` composite columns.
+    # Columns are (country, regime), or (sigma, country, regime) for a sigma grid; rows where a country lacks either
+    # input are NaN, so `out[country].dropna()` matches regime_probabilities for that country.
+    names = list(centers or REGIME_CENTERS)
+    if countries is None:
+        countries = [c.split("|")[0] for c in composites.columns if c.endswith("|GROWTH") and c.replace("|GROWTH", "|INFLATION") in composites.columns]
+    cols = pd.MultiIndex.from_product([countries, names], names=["country", "regime"])
+    if np.ndim(sigma):
+        cols = pd.MultiIndex.from_product([list(sigma), countries, names], names=["sigma", "country", "regime"])
+    if not len(countries):
+        return pd.DataFrame(index=composites.index, columns=cols, dtype=float)
+    nan = pd.Series(np.nan, index=composites.index)
+    z = np.stack([
+        np.column_stack([composites.get(f"{c}|GROWTH", nan).to_numpy(dtype=float) for c in countries]),
+        np.column_stack([composites.get(f"{c}|INFLATION", nan).to_numpy(dtype=float) for c in countries]),
+    ], axis=-1)
+    p = regime_probability_cube(z, sigma, centers)
+    if np.ndim(sigma):
+        p = p.transpose(0, 2, 1, 3)  # (date, sigma, country, regime)
+    return pd.DataFrame(p.reshape(len(composites.index), -1), index=composites.index, columns=cols)
 
 
 def regime_probabilities(growth_z: pd.Series, infl_z: pd.Series, sigma: float = 1.0) -> pd.DataFrame:
     df = pd.concat([growth_z.rename("growth_z"), infl_z.rename("infl_z")], axis=1).dropna()
     if df.empty:
-        return pd.DataFrame(columns=["Reflation", "Goldilocks", "Stagflation", "Slowdown"]) 
-
-    centers = {
-        "Reflation": (1.0, 1.0),
-        "Goldilocks": (1.0, -1.0),
-        "Stagflation": (-1.0, 1.0),
-        "Slowdown": (-1.0, -1.0),
-    }
-    scores = []
-    names = []
-    for n, (cx, cy) in centers.items():
-        d2 = (df["growth_z"] - cx) ** 2 + (df["infl_z"] - cy) ** 2
-        scores.append((-(d2) / (2 * sigma * sigma)).values)
-        names.append(n)
-    p = _softmax(np.vstack(scores).T)
-    out = pd.DataFrame(p * 100, index=df.index, columns=names)
+        return pd.DataFrame(columns=REGIMES)
+    out = pd.DataFrame(regime_probability_cube(df.to_numpy(dtype=float), sigma), index=df.index, columns=REGIMES)
     out["Reflation_prob"] = out["Reflation"]
     out["Slowdown_prob"] = out["Slowdown"]
     return out
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Macro tidy layer: a narrow observation table (id, date, value_t) whose `id` is a categorical over the rows of an
+# indicator dimension table (index id, categorical metadata). Metadata is joined onto observations only on demand.
+DIM_COLUMNS = ["display_name", "source", "country", "frequency", "type", "timing", "pillar", "weight", "as_of", "ffill_applied"]
+CATEGORICAL_COLUMNS = ["display_name", "source", "country", "frequency", "type", "timing", "pillar"]
+OBS_COLUMNS = ["id", "date", "value_t"]
+
+
+def indicator_table(catalog: list[dict]) -> pd.DataFrame:
+    dims = pd.DataFrame([{k: ind.get(k) for k in ["id", *DIM_COLUMNS]} for ind in catalog], columns=["id", *DIM_COLUMNS]).set_index("id")
+    for k in CATEGORICAL_COLUMNS:
+        dims[k] = dims[k].astype("category")
+    dims["weight"] = dims["weight"].astype(float)
+    dims["as_of"] = pd.to_datetime(dims["as_of"])
+    dims["ffill_applied"] = dims["ffill_applied"].astype(bool)
+    return dims
+
+
+def observation_table(series: dict[str, pd.Series], ids: pd.Index) -> pd.DataFrame:
+    # one block of rows per indicator; `ids` are the categories (the dimension table's index)
+    ids = ids.rename(None)
+    if not series:
+        return pd.DataFrame({"id": pd.Categorical([], categories=ids), "date": pd.DatetimeIndex([]), "value_t": np.array([], dtype=float)})
+    lengths = [len(s) for s in series.values()]
+    return pd.DataFrame({
+        "id": pd.Categorical.from_codes(np.repeat(ids.get_indexer(list(series)), lengths).astype(np.int32), categories=ids),
+        "date": pd.DatetimeIndex(np.concatenate([s.index.values for s in series.values()])),
+        "value_t": np.concatenate([s.to_numpy(dtype=float) for s in series.values()]),
+    })
+
+
+def join_indicators(obs: pd.DataFrame, dims: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    # attach dimension columns by category code (a positional take, no hash join)
+    codes = obs["id"].cat.codes.to_numpy()
+    out = obs.copy()
+    for k in columns:
+        out[k] = dims[k].iloc[codes].array
+    return out
+
+
+def select_observations(obs: pd.DataFrame, dims: pd.DataFrame, start=None, end=None, **filters) -> pd.DataFrame:
+    # filters are evaluated on the (small) dimension table, e.g. country=["US"], then mapped to codes
+    keep = np.ones(len(dims), dtype=bool)
+    for k, allowed in filters.items():
+        keep &= dims[k].isin(allowed).to_numpy()
+    mask = keep[obs["id"].cat.codes.to_numpy()]
+    if start is not None:
+        mask &= (obs["date"] >= pd.Timestamp(start)).to_numpy()
+    if end is not None:
+        mask &= (obs["date"] <= pd.Timestamp(end)).to_numpy()
+    return obs[mask]
+
+
+def latest_observations(obs: pd.DataFrame) -> pd.DataFrame:
+    # last row per indicator (by date)
+    return obs.sort_values(["id", "date"]).drop_duplicates("id", keep="last")
+
+
+def wide_observations(obs: pd.DataFrame, dims: pd.DataFrame, label: str = "display_name") -> pd.DataFrame:
+    # (date x indicator) values, columns labelled by a dimension column
+    wide = obs.pivot_table(index="date", columns="id", values="value_t", observed=True)
+    wide.columns = dims[label].reindex(wide.columns).astype(str).to_numpy()
+    return wide
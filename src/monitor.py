@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+from functools import partial
+
+import pandas as pd
+
+from src.backtest import BENCHMARK, BENCHMARK_WEIGHTS, walk_forward
+from src.config import ALLOWED_TICKERS, CATALOG_FETCH_DEADLINE_SECONDS, CONCEPT_PRIORITY, FEATURE_DTYPE, PROVIDER_MAX_CONCURRENCY
+from src.data_extra import resolve_series
+from src.data_fred import fetch_fred_series
+from src.data_sources.ecb_client import fetch_ecb_series
+from src.data_sources.eurostat_client import fetch_eurostat_series
+from src.data_sources.executor import run_grouped
+from src.data_sources.oecd_client import fetch_oecd_series
+from src.data_yf import fetch_prices
+from src.features import WINDOW_FEATURES, FeatureBundle, incremental_features
+from src.instrument import cache_data, stage
+from src.macro.catalog_data import CATALOG_INDICATORS
+from src.macro.composites import align_composites, build_composites
+from src.macro.regimes import REGIMES, batch_regime_probabilities
+from src.macro.tidy import indicator_table, observation_table
+from src.macro.transforms import apply_transform
+from src.montecarlo import simulate_forward
+from src.pipeline import Pipeline
+from src.portfolio import allocation_grid, recommend_weights, regime_scenarios
+from src.regime import infer_regime
+from src.signals import build_signal_panels
+from src.utils import pct_rank, safe_div
+
+DATA_TTL_SECONDS = 21600
+
+
+def safe_fred(series_id: str, start: str, end: str) -> pd.DataFrame:
+    try:
+        return fetch_fred_series(series_id, start, end)
+    except Exception:
+        return pd.DataFrame(columns=["value"])
+
+
+@cache_data(ttl=21600)
+def load_macro_catalog(path: str = "src/macro/catalog.yaml") -> list[dict]:
+    try:
+        import yaml  # optional runtime dependency
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = yaml.safe_load(f) or {}
+            items = loaded.get("indicators", [])
+            if isinstance(items, list) and items:
+                return items
+    except Exception:
+        pass
+    return CATALOG_INDICATORS
+
+
+def fetch_indicator(ind: dict, start: str, end: str | None) -> pd.DataFrame:
+    with stage(f"{ind['source']}:{ind.get('id', ind['source_key'])}", kind="fetch"):
+        return _fetch_indicator(ind, start, end)
+
+
+def _fetch_indicator(ind: dict, start: str, end: str | None) -> pd.DataFrame:
+    source = ind["source"]
+    key = ind["source_key"]
+    try:
+        if source == "FRED":
+            return safe_fred(key, start, end)
+        if source == "OECD":
+            return fetch_oecd_series(key, start, end)
+        if source == "EUROSTAT":
+            return fetch_eurostat_series(key)
+        if source == "ECB":
+            parts = key.split("/")
+            return fetch_ecb_series(parts[1], "/".join(parts[2:]), start, end) if len(parts) >= 3 else pd.DataFrame(columns=["value"])
+    except Exception:
+        pass
+    return pd.DataFrame(columns=["value"])
+
+
+@cache_data(ttl=21600)
+def fetch_catalog_data(catalog: list[dict], start: str, end: str | None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # (observations, indicators): narrow id/date/value_t rows plus the dimension table of the indicators with data
+    jobs = [(ind["source"], partial(fetch_indicator, ind, start, end)) for ind in catalog]
+    with stage("fetch_catalog_data", kind="fetch", indicators=len(catalog)):
+        frames = run_grouped(jobs, limits=PROVIDER_MAX_CONCURRENCY, deadline=CATALOG_FETCH_DEADLINE_SECONDS)
+    fetched, series = [], {}
+    for ind, df in zip(catalog, frames):
+        if df is None or df.empty:
+            continue
+        s = df["value"].astype(float)
+        series[ind["id"]] = apply_transform(s, ind.get("transform", "LEVEL"))
+        fetched.append({**ind, "as_of": s.dropna().index.max() if not s.dropna().empty else pd.NaT, "ffill_applied": ind.get("frequency") in {"M", "Q", "A"}})
+    dims = indicator_table(fetched)
+    return observation_table(series, dims.index), dims
+
+
+def data_epoch(now: pd.Timestamp | None = None) -> int:
+    # align memoized data with the 6h st.cache_data TTL of the fetchers
+    now = now if now is not None else pd.Timestamp.utcnow()
+    return int(now.timestamp() // DATA_TTL_SECONDS)
+
+
+def default_params(today: pd.Timestamp | None = None) -> dict:
+    today = (today if today is not None else pd.Timestamp.today()).normalize()
+    return {
+        "tickers": [t for t in ALLOWED_TICKERS if t != "MCHI"],
+        "start": str((today - pd.DateOffset(years=20)).date()), "end": str(today.date()),
+        "profile": "Balanced", "flex": 0.10,
+        "provider_flags": {k: True for k in ["OECD", "TREASURY", "ECB", "EUROSTAT", "BUNDESBANK", "WORLDBANK"]},
+        "data_epoch": data_epoch(),
+    }
+
+
+def build_pipeline(cache: dict | None = None) -> Pipeline:
+    # The monitor's compute graph; parameters are set by the caller (app sidebar or the snapshot job).
+    pipe = Pipeline(cache)
+
+    @pipe.node("tickers", "start", "data_epoch")
+    def prices(tickers, start, _epoch):
+        return fetch_prices(tickers, start)
+
+    @pipe.node("prices")
+    def features(prices):
+        # the window features come from the MarketFeatureEngine, which only appends a refreshed download's new bars;
+        # the one-pass features (returns, drawdown, month ends) stay lazy in the bundle
+        return FeatureBundle(prices, FEATURE_DTYPE, incremental_features(prices, FEATURE_DTYPE, WINDOW_FEATURES))
+
+    @pipe.node("features")
+    def signal_panels(features):
+        return build_signal_panels(features)
+
+    @pipe.node("start", "end", "provider_flags", "data_epoch")
+    def macro_backbone(start, end, provider_flags, _epoch):
+        # concepts resolve concurrently (candidate fetches share the provider caps); a concept that fails or misses
+        # the deadline comes back empty like an unresolved one, with a timeout lineage entry per candidate
+        concepts = ["us_2y", "us_10y", "us_real_10y", "hy_oas", "ig_oas", "euro_inflation", "euro_unemployment"]
+        jobs = [("RESOLVE", partial(resolve_series, c, "global", start, end, provider_flags=provider_flags)) for c in concepts]
+        resolved = run_grouped(jobs, limits={"RESOLVE": len(concepts)}, deadline=CATALOG_FETCH_DEADLINE_SECONDS)
+        macro, meta = {}, {}
+        for concept, out in zip(concepts, resolved):
+            lineage = [{"candidate": c, "status": "timeout", "reason": f"not resolved within {CATALOG_FETCH_DEADLINE_SECONDS}s"} for c in CONCEPT_PRIORITY.get(concept, [])]
+            macro[concept], meta[concept] = out or (pd.DataFrame(columns=["value"]), {"concept": concept, "region": "global", "source": "NONE", "series_id": "", "lineage": lineage})
+        return macro, meta
+
+    @pipe.node("features", "macro_backbone")
+    def macro_raw(features, macro_backbone):
+        # regime drivers as observed: gaps stay missing
+        monthly, (macro, _) = features["monthly_ret"], macro_backbone
+        out = pd.DataFrame(index=monthly.index)
+        out["growth"] = monthly.get("SPY", pd.Series(index=monthly.index, dtype=float)).rolling(6).mean()
+        out["inflation"] = macro["euro_inflation"].get("value", pd.Series(dtype=float)).reindex(monthly.index)
+        out["real_rates"] = macro["us_real_10y"].get("value", pd.Series(dtype=float)).reindex(monthly.index)
+        out["slope"] = (macro["us_10y"].get("value", pd.Series(dtype=float)) - macro["us_2y"].get("value", pd.Series(dtype=float))).reindex(monthly.index)
+        out["stress"] = macro["hy_oas"].get("value", pd.Series(dtype=float)).reindex(monthly.index)
+        out["inflation"] = out["inflation"].fillna(monthly.get("BZ=F", pd.Series(index=monthly.index, dtype=float)).pct_change(12) * 100)
+        out["stress"] = out["stress"].fillna((safe_div(features["monthly_px"].get("LQD", pd.Series(dtype=float)), features["monthly_px"].get("HYG", pd.Series(dtype=float))) - 1).reindex(monthly.index))
+        return out
+
+    @pipe.node("macro_raw")
+    def macro_df(macro_raw):
+        # live view: gaps interpolated and back-filled, so a month may borrow later observations
+        return macro_raw.interpolate(limit_direction="both")
+
+    @pipe.node("macro_raw")
+    def macro_pit(macro_raw):
+        # point-in-time drivers for the walk-forward: gaps carry the last observation forward only
+        return macro_raw.ffill()
+
+    @pipe.node("macro_df")
+    def regime(macro_df):
+        return infer_regime(macro_df)
+
+    @pipe.node("macro_pit")
+    def regime_oos(macro_pit):
+        # expanding-window history: each month labelled by a fit on data up to that month only
+        return infer_regime(macro_pit, out_of_sample=True)
+
+    @pipe.node("macro_df")
+    def stress_pct(macro_df):
+        return pct_rank(macro_df["stress"]).dropna()
+
+    @pipe.node("features", "regime", "stress_pct", "profile", "flex")
+    def reco(features, regime, stress_pct, profile, flex):
+        probs = regime[0]
+        return recommend_weights(features["monthly_ret"], profile, probs.dropna().iloc[-1] if not probs.dropna().empty else pd.Series(), float(stress_pct.iloc[-1] / 100 if not stress_pct.empty else 0.5), flex=flex)
+
+    @pipe.node("features", "regime", "stress_pct")
+    def allocation_scenarios(features, regime, stress_pct):
+        # every profile x flex x regime scenario at today's stress; independent of the profile/flex widgets
+        probs = regime[0].dropna()
+        return allocation_grid(features["monthly_ret"], regime_scenarios(probs.iloc[-1] if not probs.empty else None), float(stress_pct.iloc[-1] / 100 if not stress_pct.empty else 0.5))
+
+    @pipe.node("features", "regime_oos", "macro_pit", "flex")
+    def backtest(features, regime_oos, macro_pit, flex):
+        # all profiles replayed monthly on out-of-sample regimes and a trailing stress percentile, both built
+        # from forward-filled drivers, so no month sees later data
+        return walk_forward(features["monthly_ret"], regime_oos[0], pct_rank(macro_pit["stress"]).dropna(), flex=flex)
+
+    @pipe.node("features", "regime", "reco")
+    def forward_risk(features, regime, reco):
+        # 12-month forward distribution of the recommended weights and 60/40, bootstrapped from regime-matched months
+        probs, state = regime
+        current = probs.dropna().iloc[-1] if not probs.dropna().empty else None
+        portfolios = {"Recommended": dict(zip(reco["ticker"], reco["weight"])), BENCHMARK: BENCHMARK_WEIGHTS}
+        return simulate_forward(features["monthly_ret"], portfolios, state, current)
+
+    @pipe.node("start", "end", "data_epoch")
+    def macro_tidy(start, end, _epoch):
+        return fetch_catalog_data(load_macro_catalog(), start, end)
+
+    @pipe.node("macro_tidy")
+    def composites(macro_tidy):
+        return build_composites(*macro_tidy)
+
+    @pipe.node("composites")
+    def country_regimes(composites):
+        # (country, regime) probabilities for every country with growth and inflation composites, one pass
+        return batch_regime_probabilities(align_composites(composites[0], freq=None))
+
+    @pipe.node("country_regimes")
+    def macro_regime_fallback(country_regimes):
+        # fallback regime probs from macro composites if infer_regime is insufficient
+        if "US" in country_regimes.columns.get_level_values("country"):
+            return country_regimes["US"].dropna()[REGIMES]
+        return pd.DataFrame()
+
+    @pipe.node("features", "start", "end", "data_epoch")
+    def valuation(features, start, end, _epoch):
+        # valuation metrics (best effort)
+        monthly = features["monthly_ret"]
+        val_raw = pd.DataFrame(index=monthly.index)
+        series = [("DGS10", "us10y"), ("FEDFUNDS", "fedfunds"), ("T10YIE", "breakeven10y"), ("BAMLH0A0HYM2", "hy_oas"), ("BAMLC0A0CM", "ig_oas"), ("CAPE", "cape"), ("SP500", "spx")]
+        frames = run_grouped([("FRED", partial(safe_fred, sid, start, end)) for sid, _ in series], limits=PROVIDER_MAX_CONCURRENCY, deadline=CATALOG_FETCH_DEADLINE_SECONDS)
+        for (_, col), s in zip(series, frames):
+            s = s if s is not None else pd.DataFrame(columns=["value"])
+            val_raw[col] = s.get("value", pd.Series(dtype=float)).reindex(monthly.index)
+        val_raw["hyg_lqd"] = safe_div(features["monthly_px"].get("HYG", pd.Series(dtype=float)), features["monthly_px"].get("LQD", pd.Series(dtype=float))).reindex(monthly.index)
+        val_raw["equity_risk_premium_proxy"] = (1 / val_raw["cape"]).replace([pd.NA, float("inf")], pd.NA) * 100 - val_raw["us10y"]
+        val_raw["yardeni_proxy"] = val_raw["equity_risk_premium_proxy"] - val_raw["fedfunds"]
+        return val_raw, pct_rank(val_raw).dropna(how="all")
+
+    @pipe.node("features", "valuation", "macro_df")
+    def pct_dash(features, valuation, macro_df):
+        monthly = features["monthly_ret"]
+        return pct_rank(pd.DataFrame({
+            "SPY": (1 + monthly.get("SPY", 0)).cumprod(),
+            "VGK": (1 + monthly.get("VGK", 0)).cumprod(),
+            "HYG/LQD": valuation[0]["hyg_lqd"],
+            "US 10Y-2Y": macro_df["slope"],
+        })).dropna(how="all")
+
+    return pipe
@@ -0,0 +1,83 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+from src.config import MC_BLOCK, MC_HORIZON, MC_PATHS, MC_SEED, MC_SHARD_PATHS
+from src.regime import REGIME_LABELS
+
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+def _block_paths(codes: np.ndarray, start: np.ndarray, n: int, horizon: int, block: int, rng: np.random.Generator) -> np.ndarray:
+    # (n, horizon) row indices into the history: consecutive blocks of `block` months, each starting at a month
+    # labelled with the path's current regime; the next block's regime is the label of the month that followed
+    # the previous block in history, so regime persistence comes from the data. Code len(start) marks unlabelled
+    # months; they and regimes never observed draw from every month.
+    T = len(codes)
+    starts = np.arange(max(T - block + 1, 1))
+    pools = [starts[codes[starts] == r] for r in range(len(start))]
+    pools = [p if len(p) else starts for p in pools] + [starts]
+    flat, count = np.concatenate(pools), np.array([len(p) for p in pools])
+    offset = np.r_[0, np.cumsum(count)[:-1]]
+    follow = codes[np.minimum(starts + block, T - 1)]
+    state = np.minimum(np.searchsorted(np.cumsum(start), rng.random(n) * start.sum(), side="right"), len(start) - 1)
+    out = np.empty((n, -(-horizon // block) * block), dtype=np.int64)
+    for b in range(0, out.shape[1], block):
+        s = flat[offset[state] + (rng.random(n) * count[state]).astype(np.int64)]
+        out[:, b : b + block] = np.minimum(s[:, None] + np.arange(block), T - 1)
+        state = follow[s]
+    return out[:, :horizon]
+
+
+def _simulate_shard(port_ret: np.ndarray, codes: np.ndarray, start: np.ndarray, n: int, horizon: int, block: int, seed) -> tuple[np.ndarray, np.ndarray]:
+    # horizon return and max drawdown (K portfolios x n paths); every portfolio sees the same sampled months
+    idx = _block_paths(codes, start, n, horizon, block, np.random.default_rng(seed))
+    growth = np.cumprod(1 + port_ret[:, idx], axis=-1)
+    peak = np.maximum(np.maximum.accumulate(growth, axis=-1), 1)
+    return growth[..., -1] - 1, np.minimum((growth / peak - 1).min(axis=-1), 0)
+
+
+def simulate_forward(
+    monthly_ret: pd.DataFrame, portfolios: dict[str, dict[str, float]], regime_state: pd.Series | None = None,
+    current_probs: pd.Series | None = None, n_paths: int = MC_PATHS, horizon: int = MC_HORIZON, block: int = MC_BLOCK,
+    seed: int = MC_SEED, workers: int = 1,
+) -> dict[str, pd.DataFrame]:
+    # Forward `horizon`-month distribution of fixed-weight (monthly rebalanced) portfolios by block bootstrap of
+    # the complete months of monthly_ret, conditioned on the regime labels in `regime_state` and starting from
+    # `current_probs` (unconditional without labels). Paths come in shards of MC_SHARD_PATHS with seeds spawned
+    # from `seed`, so results do not depend on `workers` (> 1 runs the shards in a process pool).
+    # Returns `summary` (portfolio x mean/VaR/CVaR/drawdown stats, losses as negative returns) and `quantiles`
+    # (percentile x (metric, portfolio)) of the horizon return and the path max drawdown.
+    tickers = sorted({t for w in portfolios.values() for t in w if t in monthly_ret.columns})
+    R = monthly_ret[tickers].dropna(how="any")
+    W = np.array([[w.get(t, 0.0) for t in tickers] for w in portfolios.values()], dtype=float)
+    port_ret = W @ R.to_numpy(dtype=float).T if len(R) else np.zeros((len(portfolios), 1))
+    labels = (regime_state.reindex(R.index) if regime_state is not None else pd.Series(index=R.index, dtype=object)).to_numpy()
+    codes = np.array([REGIME_LABELS.index(x) if x in REGIME_LABELS else len(REGIME_LABELS) for x in labels], dtype=np.int64).reshape(-1)
+    start = (current_probs if current_probs is not None else pd.Series(dtype=float)).reindex(REGIME_LABELS).fillna(0).to_numpy(dtype=float)
+    if (codes == len(REGIME_LABELS)).all() or start.sum() <= 0:
+        codes, start = np.zeros(max(len(R), 1), dtype=np.int64), np.ones(1)
+    sizes = [min(MC_SHARD_PATHS, n_paths - i) for i in range(0, n_paths, MC_SHARD_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(port_ret, codes, start, n, horizon, block, s) for n, s in zip(sizes, seeds)]
+    if workers > 1 and len(args) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_simulate_shard, *zip(*args)))
+    else:
+        shards = [_simulate_shard(*a) for a in args]
+    ret, mdd = (np.concatenate([s[i] for s in shards], axis=1) for i in range(2))
+
+    names = list(portfolios)
+    q05, q01 = np.quantile(ret, [0.05, 0.01], axis=1)
+    summary = pd.DataFrame({
+        "mean": ret.mean(axis=1), "median": np.median(ret, axis=1), "prob_loss": (ret < 0).mean(axis=1),
+        "var_95": q05, "cvar_95": ret.mean(axis=1, where=ret <= q05[:, None]),
+        "var_99": q01, "cvar_99": ret.mean(axis=1, where=ret <= q01[:, None]),
+        "mdd_median": np.median(mdd, axis=1), "mdd_95": np.quantile(mdd, 0.05, axis=1),
+    }, index=pd.Index(names, name="portfolio"))
+    quantiles = pd.concat({
+        "return": pd.DataFrame(np.quantile(ret, QUANTILES, axis=1), columns=names),
+        "max_drawdown": pd.DataFrame(np.quantile(mdd, QUANTILES, axis=1), columns=names),
+    }, axis=1, names=["metric", "portfolio"]).set_axis(pd.Index(np.round(QUANTILES * 100).astype(int), name="percentile"))
+    return {"summary": summary, "quantiles": quantiles}
@@ -2,6 +2,8 @@ from __future__ import annotations
 
 import pandas as pd
 
+from src.macro.tidy import join_indicators, latest_observations
+
 
 def key_takeaways_from_metrics(metrics: dict) -> list[str]:
     reg = metrics.get("top_regime", "Indeterminado")
@@ -33,19 +35,19 @@ def committee_text(metrics: dict) -> str:
     )
 
 
-def macro_regime_section(contrib: pd.DataFrame, composites: pd.DataFrame) -> str:
+def macro_regime_section(contrib: pd.DataFrame, composites: pd.DataFrame, indicators: pd.DataFrame) -> str:
     if contrib.empty or composites.empty:
         return "### MACRO REGIME\nSin datos macro suficientes para construir el bloque."
     lines = ["### MACRO REGIME"]
-    countries = sorted(contrib["country"].dropna().unique().tolist())
+    latest = join_indicators(latest_observations(contrib), indicators, ["country", "display_name", "type", "timing"])
+    countries = sorted(latest["country"].dropna().unique().tolist())
     latest_date = composites.dropna(how="all").index.max()
     for c in countries[:5]:
         g = composites.get(f"{c}|GROWTH", pd.Series(dtype=float))
         i = composites.get(f"{c}|INFLATION", pd.Series(dtype=float))
         gz = float(g.dropna().iloc[-1]) if not g.dropna().empty else float("nan")
         iz = float(i.dropna().iloc[-1]) if not i.dropna().empty else float("nan")
-        sub = contrib[contrib["country"] == c].sort_values("date").groupby("display_name").tail(1)
-        top = sub.sort_values("contribution", ascending=False).head(3)
+        top = latest[latest["country"] == c].sort_values("contribution", ascending=False).head(3)
         drivers = ", ".join([f"{r.display_name} ({r.type}/{r.timing})" for r in top.itertuples()]) if not top.empty else "n/a"
         lines.append(f"- **{c}** | Growth z: {gz:.2f} | Inflation z: {iz:.2f} | Top drivers: {drivers}.")
     lines.append(f"As-of macro composites: {latest_date.date() if pd.notna(latest_date) else 'n/a'}.")
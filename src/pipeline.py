@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from types import CodeType
+from typing import Any, Callable, MutableMapping
+
+from src.instrument import cache_event, stage
+from src.utils import fingerprint
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    fn: Callable[..., Any]
+    inputs: tuple[str, ...]
+    code_key: str
+
+
+def _code_bytes(code: CodeType) -> bytes:
+    # nested code objects (lambdas, comprehensions) repr with their address, so hash them recursively
+    parts = [code.co_code, repr(code.co_names).encode()]
+    for c in code.co_consts:
+        parts.append(_code_bytes(c) if isinstance(c, CodeType) else repr(c).encode())
+    return b"|".join(parts)
+
+
+def _code_key(fn: Callable[..., Any]) -> str:
+    # editing a node's body (Streamlit runOnSave) must invalidate its memoized output
+    code = getattr(fn, "__code__", None)
+    raw = getattr(fn, "__qualname__", type(fn).__name__).encode() + (_code_bytes(code) if code is not None else b"")
+    return hashlib.sha1(raw).hexdigest()
+
+
+class Pipeline:
+    # Memoized compute DAG. Parameters are fingerprinted by value; a node's key is derived from its name, code
+    # and the keys of its inputs, so a changed parameter only invalidates the nodes downstream of it. Outputs
+    # live in `cache` (pass a dict held in st.session_state to keep them across Streamlit reruns).
+
+    def __init__(self, cache: MutableMapping[str, tuple[str, Any]] | None = None) -> None:
+        self.nodes: dict[str, Node] = {}
+        self.params: dict[str, tuple[str, Any]] = {}
+        self.cache = {} if cache is None else cache
+        self.recomputed: list[str] = []
+        self._keys: dict[str, str] = {}
+
+    def node(self, *inputs: str, name: str | None = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        def register(fn: Callable[..., Any]) -> Callable[..., Any]:
+            self.add(name or fn.__name__, fn, inputs)
+            return fn
+        return register
+
+    def add(self, name: str, fn: Callable[..., Any], inputs: tuple[str, ...] | list[str] = ()) -> None:
+        if name in self.params:
+            raise ValueError(f"'{name}' is already a parameter")
+        self.nodes[name] = Node(name, fn, tuple(inputs), _code_key(fn))
+        self._keys.clear()
+
+    def set_params(self, **params: Any) -> None:
+        for k, v in params.items():
+            if k in self.nodes:
+                raise ValueError(f"'{k}' is already a node")
+            self.params[k] = (fingerprint(v), v)
+        self._keys.clear()
+
+    def key(self, name: str) -> str:
+        if name in self.params:
+            return self.params[name][0]
+        if name not in self._keys:
+            node = self.nodes[name]
+            raw = "|".join([name, node.code_key, *[self.key(i) for i in node.inputs]])
+            self._keys[name] = hashlib.sha1(raw.encode()).hexdigest()
+        return self._keys[name]
+
+    def get(self, name: str) -> Any:
+        if name in self.params:
+            return self.params[name][1]
+        if name not in self.nodes:
+            raise KeyError(f"Unknown pipeline node or parameter: {name}")
+        key = self.key(name)
+        hit = self.cache.get(name)
+        if hit is not None and hit[0] == key:
+            cache_event("pipeline", hit=True, node=name)
+            return hit[1]
+        cache_event("pipeline", hit=False, node=name)
+        node = self.nodes[name]
+        args = [self.get(i) for i in node.inputs]
+        with stage(name, kind="node"):
+            value = node.fn(*args)
+        self.cache[name] = (key, value)
+        self.recomputed.append(name)
+        return value
+
+    __getitem__ = get
+
+    def seed(self, outputs: dict[str, tuple[str, Any]]) -> list[str]:
+        # Preload precomputed (key, value) outputs, e.g. from a snapshot; only entries whose key matches the
+        # current graph and parameters are taken, everything else is still computed live on demand.
+        taken = []
+        for name, (key, value) in outputs.items():
+            if name in self.nodes and self.key(name) == key:
+                hit = self.cache.get(name)
+                if hit is None or hit[0] != key:
+                    self.cache[name] = (key, value)
+                taken.append(name)
+        return taken
+
+    def downstream(self, name: str) -> list[str]:
+        out: set[str] = set()
+        frontier = {name}
+        while frontier:
+            frontier = {n for n, node in self.nodes.items() if n not in out and frontier.intersection(node.inputs)}
+            out |= frontier
+        return sorted(out)
@@ -1,9 +1,62 @@
 from __future__ import annotations
 
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 
+from src.config import PLOT_CACHE_MAX_ENTRIES, PLOT_CACHE_MAX_MB, PLOT_MAX_POINTS, PLOT_STEP_MIN_FLAT, PLOT_WEBGL_MIN_POINTS
+from src.instrument import cache_event, stage
+from src.utils import fingerprint
+
+# built figures shared across reruns and sessions, stored as plotly JSON so every caller gets its own go.Figure;
+# LRU bounded by entry count and by the bytes of the plotted arrays. A chart called with `key=` (the pipeline
+# key of the node its frames come from, plus whatever else selects them) is looked up by that key and its
+# remaining arguments without hashing the frames; without `key` the frames are fingerprinted.
+_FIGURES: OrderedDict[str, tuple[dict, int]] = OrderedDict()
+_FIGURE_BYTES = 0
+_LOCK = threading.Lock()
+
+
+def _figure_nbytes(fig: go.Figure) -> int:
+    return sum(np.asarray(v).nbytes for tr in fig.data for v in (getattr(tr, k, None) for k in ("x", "y", "z")) if v is not None)
+
+
+def _is_frame(v) -> bool:
+    return isinstance(v, (pd.DataFrame, pd.Series))
+
+
+def _cached(build):
+    @functools.wraps(build)
+    def wrapper(*args, key=None, **kwargs):
+        global _FIGURE_BYTES
+        if key is None:
+            cache_key = fingerprint((build.__name__, args, kwargs))
+        else:
+            cache_key = fingerprint((build.__name__, key, [a for a in args if not _is_frame(a)], {k: v for k, v in kwargs.items() if not _is_frame(v)}))
+        with _LOCK:
+            hit = _FIGURES.get(cache_key)
+            if hit is not None:
+                _FIGURES.move_to_end(cache_key)
+        cache_event("figures", hit=hit is not None, chart=build.__name__)
+        if hit is not None:
+            return go.Figure(hit[0])
+        with stage(build.__name__, kind="figure"):
+            fig = build(*args, **kwargs)
+        size = _figure_nbytes(fig)
+        with _LOCK:
+            if cache_key not in _FIGURES:
+                _FIGURES[cache_key] = (fig.to_plotly_json(), size)
+                _FIGURE_BYTES += size
+            while _FIGURES and (len(_FIGURES) > PLOT_CACHE_MAX_ENTRIES or _FIGURE_BYTES > PLOT_CACHE_MAX_MB * 2**20):
+                _FIGURE_BYTES -= _FIGURES.popitem(last=False)[1][1]
+        return fig
+
+    return wrapper
+
 
 def _coerce_numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
     if df is None or df.empty:
@@ -15,18 +68,86 @@ def _coerce_numeric_frame(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def line(df: pd.DataFrame, title: str, y_title: str = ""):
+def _lttb(x: np.ndarray, Y: np.ndarray, n: int) -> np.ndarray:
+    # largest-triangle-three-buckets over the columns of Y (N x k, no NaN) sharing x: (n, k) row indices, first
+    # and last row always kept; each bucket keeps the point forming the largest triangle with the previous pick
+    # and the next bucket's mean
+    N, k = Y.shape
+    edges = np.linspace(1, N - 1, n - 1).astype(np.int64)
+    nxt = np.r_[edges[1:], N]
+    sum_x, sum_y = np.add.reduceat(x[:-1], edges[:-1]), np.add.reduceat(Y[:-1], edges[:-1], axis=0)
+    cnt = np.diff(edges)[:, None]
+    mean_x = np.r_[(sum_x[1:] / cnt[1:, 0]), x[-1]]
+    mean_y = np.vstack([sum_y[1:] / cnt[1:], Y[-1:]])
+    out = np.empty((n, k), dtype=np.int64)
+    out[0], out[-1] = 0, N - 1
+    a, cols = np.zeros(k, dtype=np.int64), np.arange(k)
+    for i in range(n - 2):
+        lo, hi = edges[i], nxt[i]
+        xa, ya = x[a], Y[a, cols]
+        area = np.abs((xa - mean_x[i]) * (Y[lo:hi] - ya) - (xa - x[lo:hi, None]) * (mean_y[i] - ya))
+        a = lo + area.argmax(axis=0)
+        out[i + 1] = a
+    return out
+
+
+def _keep_gaps(valid: np.ndarray, keep: np.ndarray) -> np.ndarray:
+    # add the first NaN of every interior gap and the valid points around it, so lines break and resume where they did
+    starts = np.flatnonzero(valid[:-1] & ~valid[1:]) + 1
+    ends = np.flatnonzero(~valid[:-1] & valid[1:]) + 1
+    first, last = np.argmax(valid), len(valid) - 1 - np.argmax(valid[::-1])
+    starts, ends = starts[(starts > first) & (starts < last)], ends[(ends > first) & (ends <= last)]
+    return np.unique(np.r_[keep, starts, starts - 1, ends])
+
+
+def _downsample(clean: pd.DataFrame, max_points: int | None) -> dict[str, tuple[np.ndarray, bool]]:
+    # Per column: row positions to plot and whether it is a step series. Forward-filled (step) columns keep only
+    # the points where the value changes plus run ends before gaps and at the end, drawn with an "hv" shape, which
+    # is lossless; anything still above max_points is reduced by LTTB. Columns without NaN share one LTTB pass.
+    Y = clean.to_numpy(dtype=float)
+    N = len(Y)
+    idx = clean.index
+    x = idx.asi8.astype(float) if isinstance(idx, pd.DatetimeIndex) else idx.to_numpy(dtype=float) if pd.api.types.is_numeric_dtype(idx) else np.arange(N, dtype=float)
+    rows, dense = {}, []
+    for j, col in enumerate(clean.columns):
+        y, valid = Y[:, j], ~np.isnan(Y[:, j])
+        pos = np.flatnonzero(valid)
+        same = np.diff(y[pos]) == 0
+        step = len(pos) > 2 and same.mean() >= PLOT_STEP_MIN_FLAT
+        if step:
+            pos = pos[np.r_[True, ~same]]
+            pos = np.unique(np.r_[pos, np.flatnonzero(valid)[-1]])
+        if max_points and len(pos) > max_points:
+            if not step and valid.all():
+                dense.append(j)
+                continue
+            pos = pos[_lttb(x[pos], Y[pos, j : j + 1], max_points)[:, 0]]
+        rows[col] = (_keep_gaps(valid, pos) if not valid.all() else pos, step)
+    if dense:
+        picks = _lttb(x, Y[:, dense], max_points)
+        for i, j in enumerate(dense):
+            rows[clean.columns[j]] = (np.unique(picks[:, i]), False)
+    return {col: rows[col] for col in clean.columns}
+
+
+@_cached
+def line(df: pd.DataFrame, title: str, y_title: str = "", max_points: int | None = PLOT_MAX_POINTS):
+    # long series are downsampled per trace (see _downsample) and drawn with WebGL above PLOT_WEBGL_MIN_POINTS;
+    # max_points=None plots every point
     clean = _coerce_numeric_frame(df)
     fig = go.Figure()
     if clean.empty:
         fig.add_annotation(text="No numeric data available", x=0.5, y=0.5, showarrow=False, xref="paper", yref="paper")
     else:
-        for col in clean.columns:
-            fig.add_trace(go.Scatter(x=clean.index, y=clean[col], mode="lines", name=str(col)))
+        traces = _downsample(clean, max_points) if max_points else {col: (np.arange(len(clean)), False) for col in clean.columns}
+        scatter = go.Scattergl if sum(len(r) for r, _ in traces.values()) >= PLOT_WEBGL_MIN_POINTS else go.Scatter
+        for col, (rows, step) in traces.items():
+            fig.add_trace(scatter(x=clean.index[rows], y=clean[col].to_numpy(dtype=float)[rows], mode="lines", name=str(col), line_shape="hv" if step else "linear"))
     fig.update_layout(title=title, height=280, yaxis_title=y_title, margin=dict(l=10, r=10, t=40, b=10))
     return fig
 
 
+@_cached
 def heatmap(df: pd.DataFrame, title: str):
     clean = _coerce_numeric_frame(df)
     if clean.empty:
@@ -36,6 +157,7 @@ def heatmap(df: pd.DataFrame, title: str):
     return fig
 
 
+@_cached
 def bars(df: pd.DataFrame, x: str, y: str, title: str, color: str | None = None):
     clean = df.copy()
     if y in clean.columns:
@@ -43,6 +165,24 @@ def bars(df: pd.DataFrame, x: str, y: str, title: str, color: str | None = None)
     clean = clean.dropna(subset=[x, y]) if x in clean.columns and y in clean.columns else pd.DataFrame(columns=[x, y])
     if clean.empty:
         clean = pd.DataFrame({x: ["No data"], y: [0.0]})
+    import plotly.express as px  # heavy import, deferred to the first bar chart
+
     fig = px.bar(clean, x=x, y=y, color=color if color in clean.columns else None, title=title)
     fig.update_layout(height=300, margin=dict(l=10, r=10, t=40, b=10))
     return fig
+
+
+def waterfall(spans: pd.DataFrame, title: str, limit: int = 60):
+    # timeline of stage spans (name, kind, start epoch seconds, seconds): one bar per span from its start offset,
+    # longest `limit` spans kept, ordered by start. Not cached: the spans differ on every rerun.
+    if spans is None or spans.empty:
+        return line(pd.DataFrame(), title)
+    df = spans.nlargest(limit, "seconds").sort_values("start")
+    offset = df["start"] - spans["start"].min()
+    fig = go.Figure()
+    for kind, part in df.groupby("kind", sort=False):
+        fig.add_trace(go.Bar(y=part["name"], x=part["seconds"], base=offset[part.index], orientation="h", name=str(kind)))
+    fig.update_layout(title=title, height=max(280, 18 * len(df) + 80), barmode="overlay", xaxis_title="seconds since first span",
+                      yaxis=dict(autorange="reversed", type="category", categoryorder="array", categoryarray=df["name"].drop_duplicates().tolist()),
+                      margin=dict(l=10, r=10, t=40, b=10))
+    return fig
@@ -1,36 +1,133 @@
 from __future__ import annotations
 import pandas as pd
 import numpy as np
-from sklearn.covariance import LedoitWolf
-from src.config import PROFILE_ANCHORS
+from src.config import ALLOCATION_FLEX_GRID, PROFILE_ANCHORS
+from src.regime import REGIME_LABELS
+
+EQUITY = ["SPY", "VGK", "EWJ", "IEMG", "IVE", "IVW", "CV9.PA", "CG9.PA"]
+BONDS = ["SHY", "IEI", "IEF", "TLT", "LQD", "HYG", "EM13.MI", "CBE7.AS", "LYXD.DE", "IEAC.L", "IHYG.L"]
+GOLD = ["GLD"]
+COV_WINDOW = 120
+
+
+def investable_buckets(columns) -> tuple[list[str], list[str], list[str]]:
+    return [c for c in EQUITY if c in columns], [c for c in BONDS if c in columns], [c for c in GOLD if c in columns]
+
+
+def rolling_moments(R: np.ndarray, window: int = COV_WINDOW) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # For the trailing window ending at every row of R (T x p, no NaN): mean, mean of its last 12 rows and the
+    # diagonal of the Ledoit-Wolf shrunk covariance (same estimate as sklearn's LedoitWolf().fit). Every window
+    # comes from differences of prefix sums of x, x x', x^2 x' and x^2 x^2', so all T windows cost O(T p^2)
+    # instead of one O(window p^2) refit per row.
+    T, p = R.shape
+    x2 = R ** 2
+
+    def prefix(a):
+        return np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+
+    P1, P2 = prefix(R), prefix(R[:, :, None] * R[:, None, :])
+    P3, P4 = prefix(x2[:, :, None] * R[:, None, :]), prefix(x2[:, :, None] * x2[:, None, :])
+    k = np.arange(1, T + 1)
+    lo, lo12 = np.maximum(k - window, 0), np.maximum(k - min(window, 12), 0)
+    n = (k - lo).astype(float)
+    s1, s2, s3, s4 = P1[k] - P1[lo], P2[k] - P2[lo], P3[k] - P3[lo], P4[k] - P4[lo]
+    m = s1 / n[:, None]
+    mean12 = (P1[k] - P1[lo12]) / (k - lo12)[:, None]
+    cov = s2 / n[:, None, None] - m[:, :, None] * m[:, None, :]  # MLE covariance of the centered window
+    var = np.einsum("tii->ti", cov)
+    # sum_ij sum_k (x_ki - m_i)^2 (x_kj - m_j)^2 expanded in the raw moments
+    w = m ** 2
+    diag2 = np.einsum("tii->ti", s2)
+    beta_ = (
+        s4.sum(axis=(1, 2)) - 4 * np.einsum("tij,tj->t", s3, m) + 4 * np.einsum("ti,tij,tj->t", m, s2, m)
+        + 2 * diag2.sum(axis=1) * w.sum(axis=1) - 4 * (m * s1).sum(axis=1) * w.sum(axis=1) + n * w.sum(axis=1) ** 2
+    )
+    delta_ = (cov ** 2).sum(axis=(1, 2))
+    mu = var.sum(axis=1) / p
+    beta = (beta_ / n - delta_) / (p * n)
+    delta = (delta_ - 2 * mu * var.sum(axis=1) + p * mu ** 2) / p
+    beta = np.minimum(beta, delta)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shrinkage = np.where((beta == 0) | (delta <= 0), 0.0, beta / delta) if p > 1 else np.zeros(T)
+    return m, mean12, (1 - shrinkage)[:, None] * var + (shrinkage * mu)[:, None]
+
+
+def bucket_targets(anchor: dict, regime_probs, flex: float = 0.10) -> np.ndarray:
+    # (equity, bonds, gold) targets: the profile anchor tilted by regime probabilities
+    return np.array([
+        anchor["equity"] + flex * (regime_probs.get("Goldilocks", 0) - regime_probs.get("Slowdown", 0)),
+        anchor["bonds"] + flex * (regime_probs.get("Slowdown", 0) + regime_probs.get("Stagflation", 0) - 0.5),
+        anchor["gold"],
+    ], dtype=float)
+
+
+def _score_weights(mu: np.ndarray, risk: np.ndarray, tickers: list[str], stress: float) -> np.ndarray:
+    score = mu - 0.5 * risk
+    if stress > 0.6 and "HYG" in tickers:
+        score[tickers.index("HYG")] -= 0.05
+    w = np.clip(score, 0, None)
+    return w / w.sum()
+
+
+def _scale_and_cap(w: np.ndarray, sizes: list[int], targets: np.ndarray) -> np.ndarray:
+    # rescale each bucket of w to its target and apply the 25% cap; targets (..., 3) broadcast to weights (..., p)
+    ids = np.repeat(np.arange(3), sizes)
+    s = np.bincount(ids, weights=w, minlength=3)
+    factor = np.divide(targets, s, out=np.zeros(np.broadcast(targets, s).shape), where=s > 0)
+    out = np.clip(w * factor[..., ids], 0, 0.25)
+    return out / out.sum(axis=-1, keepdims=True)
+
+
+def allocate(mu: np.ndarray, risk: np.ndarray, buckets: tuple[list[str], list[str], list[str]], anchor: dict, regime_probs, stress: float, flex: float = 0.10) -> np.ndarray:
+    # weights over eq + bd + gd (in that order) from expected returns and risk, tilted by regime and stress
+    w = _score_weights(mu, risk, [t for b in buckets for t in b], stress)
+    return _scale_and_cap(w, [len(b) for b in buckets], bucket_targets(anchor, regime_probs, flex))
+
+
+def _estimates(monthly_ret: pd.DataFrame):
+    # buckets, expected returns and Ledoit-Wolf risk from the last COV_WINDOW complete months (None if there are none)
+    buckets = investable_buckets(monthly_ret.columns)
+    r = monthly_ret[[t for b in buckets for t in b]].dropna(how="any").tail(COV_WINDOW)
+    if r.empty:
+        return buckets, None, None
+    mean, mean12, risk = (a[-1] for a in rolling_moments(r.to_numpy(dtype=float), len(r)))
+    return buckets, mean * (1 - 0.5) + mean12 * 0.5, risk
 
 
 def recommend_weights(monthly_ret: pd.DataFrame, profile: str, regime_probs: pd.Series, stress: float, flex: float = 0.10) -> pd.DataFrame:
     anchor = PROFILE_ANCHORS[profile]
-    eq = [c for c in ["SPY", "VGK", "EWJ", "IEMG", "IVE", "IVW", "CV9.PA", "CG9.PA"] if c in monthly_ret.columns]
-    bd = [c for c in ["SHY", "IEI", "IEF", "TLT", "LQD", "HYG", "EM13.MI", "CBE7.AS", "LYXD.DE", "IEAC.L", "IHYG.L"] if c in monthly_ret.columns]
-    gd = [c for c in ["GLD"] if c in monthly_ret.columns]
+    (eq, bd, gd), mu, risk = _estimates(monthly_ret)
     investable = eq + bd + gd
-    r = monthly_ret[investable].dropna(how="any").tail(120)
-    if r.empty:
+    if mu is None:
         return pd.DataFrame({"ticker": investable, "weight": 0.0, "anchor": 0.0, "delta": 0.0})
-    mu = r.mean() * (1 - 0.5) + r.tail(12).mean() * 0.5
-    cov = pd.DataFrame(LedoitWolf().fit(r.values).covariance_, index=r.columns, columns=r.columns)
-    risk = pd.Series(np.diag(cov), index=r.columns)
-    score = mu - 0.5 * risk
-    if stress > 0.6 and "HYG" in score.index:
-        score["HYG"] -= 0.05
-    w = score.clip(lower=0)
-    w = w / w.sum()
-    def scale(bucket, target):
-        s = w[bucket].sum()
-        return w[bucket] * (target / s if s > 0 else 0)
-    we = scale(eq, anchor["equity"] + flex * (regime_probs.get("Goldilocks", 0) - regime_probs.get("Slowdown", 0)))
-    wb = scale(bd, anchor["bonds"] + flex * (regime_probs.get("Slowdown", 0) + regime_probs.get("Stagflation", 0) - 0.5))
-    wg = scale(gd, anchor["gold"])
-    w_all = pd.concat([we, wb, wg]).clip(0, 0.25)
-    w_all = w_all / w_all.sum()
-    out = pd.DataFrame({"ticker": w_all.index, "weight": w_all.values})
+    w = allocate(mu, risk, (eq, bd, gd), anchor, regime_probs, stress, flex)
+    out = pd.DataFrame({"ticker": investable, "weight": w})
     out["anchor"] = out["ticker"].map({**{t: anchor["equity"]/max(len(eq),1) for t in eq}, **{t: anchor["bonds"]/max(len(bd),1) for t in bd}, **{t: anchor["gold"]/max(len(gd),1) for t in gd}})
     out["delta"] = out["weight"] - out["anchor"]
     return out.sort_values("weight", ascending=False)
+
+
+def regime_scenarios(current: pd.Series | None = None) -> pd.DataFrame:
+    # default scenario set (scenario x regime probabilities): the current reading, each regime outright, neutral
+    rows = {"Current": current} if current is not None and not current.dropna().empty else {}
+    rows.update({r: {k: float(k == r) for k in REGIME_LABELS} for r in REGIME_LABELS})
+    rows["Neutral"] = {k: 1 / len(REGIME_LABELS) for k in REGIME_LABELS}
+    return pd.DataFrame.from_dict({k: dict(v) for k, v in rows.items()}, orient="index")[REGIME_LABELS].rename_axis("scenario")
+
+
+def allocation_grid(monthly_ret: pd.DataFrame, scenarios: pd.DataFrame, stress: float, flex_grid=ALLOCATION_FLEX_GRID, profiles: list[str] | None = None) -> pd.DataFrame:
+    # Weights for every profile x flex x scenario (rows of regime probabilities) in one call: the covariance and
+    # the score weights are computed once and the bucket targets, scaling and cap are broadcast over the grid.
+    # Index (profile, flex, scenario), columns eq + bd + gd.
+    profiles = list(profiles or PROFILE_ANCHORS)
+    buckets, mu, risk = _estimates(monthly_ret)
+    tickers = [t for b in buckets for t in b]
+    index = pd.MultiIndex.from_product([profiles, list(flex_grid), list(scenarios.index)], names=["profile", "flex", "scenario"])
+    if mu is None:
+        return pd.DataFrame(0.0, index=index, columns=tickers)
+    p = {k: scenarios.get(k, pd.Series(0.0, index=scenarios.index)).fillna(0).to_numpy(dtype=float) for k in REGIME_LABELS}
+    anchors = np.array([[PROFILE_ANCHORS[k][b] for b in ["equity", "bonds", "gold"]] for k in profiles])[:, None, None, :]
+    flex = np.asarray(flex_grid, dtype=float)[None, :, None]
+    tilt = np.stack(np.broadcast_arrays(flex * (p["Goldilocks"] - p["Slowdown"]), flex * (p["Slowdown"] + p["Stagflation"] - 0.5), 0.0), axis=-1)
+    w = _scale_and_cap(_score_weights(mu, risk, tickers, stress), [len(b) for b in buckets], anchors + tilt)
+    return pd.DataFrame(w.reshape(len(index), len(tickers)), index=index, columns=tickers)
@@ -1,29 +1,127 @@
 from __future__ import annotations
+import copy
+import os
+import pickle
+import threading
+from pathlib import Path
 import pandas as pd
 import numpy as np
-from sklearn.mixture import GaussianMixture
+from src.config import REGIME_MODEL_DIR, REGIME_MODEL_MAX_ENTRIES, REGIME_WARM_START_MAX_NEW
+from src.utils import fingerprint
 
+REGIME_LABELS = ["Goldilocks", "Reflation", "Slowdown", "Stagflation"]
+MIN_OBS = 36
 
-def infer_regime(feature_df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+# fitted models keyed by fingerprint(mode, features): in-process front of an on-disk pickle store
+_MODELS: dict[str, dict] = {}
+_LOCK = threading.Lock()
+
+
+def _model_path(key: str) -> Path:
+    return Path(os.environ.get("CAM_MODEL_STORE", REGIME_MODEL_DIR)) / f"{key}.pkl"
+
+
+def _load_fit(key: str) -> dict | None:
+    with _LOCK:
+        if key in _MODELS:
+            return _MODELS[key]
+    try:
+        entry = pickle.loads(_model_path(key).read_bytes())
+    except Exception:
+        return None
+    with _LOCK:
+        _MODELS[key] = entry
+    return entry
+
+
+def _save_fit(key: str, entry: dict) -> None:
+    with _LOCK:
+        _MODELS[key] = entry
+        while len(_MODELS) > REGIME_MODEL_MAX_ENTRIES:
+            _MODELS.pop(next(iter(_MODELS)))
+    path = _model_path(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(pickle.dumps(entry))
+        os.replace(tmp, path)
+        for old in sorted(path.parent.glob("*.pkl"), key=lambda p: p.stat().st_mtime)[:-REGIME_MODEL_MAX_ENTRIES]:
+            old.unlink(missing_ok=True)
+    except Exception:
+        pass
+
+
+def _fit(X: np.ndarray, model=None):
+    from sklearn.mixture import GaussianMixture  # heavy import, deferred to first fit
+
+    # warm_start: every fit() after the first resumes EM from the current parameters (no k-means init, a few
+    # iterations), so refitting on a few extra months is cheap; the first fit is the usual cold fit
+    model = model if model is not None else GaussianMixture(n_components=4, random_state=7, warm_start=True)
+    return model.fit(X)
+
+
+def _pct_rank_at(x: np.ndarray, j: int) -> float:
+    # x.rank(pct=True) (average ties) of element j
+    return ((x < x[j]).sum() + ((x == x[j]).sum() + 1) / 2) / len(x)
+
+
+def _labelled_probs(gm, X: np.ndarray) -> np.ndarray:
+    # (T, regime) component probabilities summed into REGIME_LABELS; a component is named after the growth and
+    # inflation percentiles (within X) of the month it explains best
+    p = np.clip(gm.predict_proba(X), 0.02, 0.94)
+    p = p / p.sum(axis=1, keepdims=True)
+    out = np.zeros((len(X), len(REGIME_LABELS)))
+    for i in range(p.shape[1]):
+        j = int(np.argmax(p[:, i]))
+        gh, ih = _pct_rank_at(X[:, 0], j) >= 0.5, _pct_rank_at(X[:, 1], j) >= 0.5
+        out[:, REGIME_LABELS.index("Reflation" if gh and ih else "Goldilocks" if gh else "Stagflation" if ih else "Slowdown")] += p[:, i]
+    return out
+
+
+def _cached_fit(X: pd.DataFrame, mode: str) -> tuple[str, dict | None, int]:
+    # (key, exact or warm-start entry, months the entry is behind X): looks up X and then its prefixes missing
+    # up to REGIME_WARM_START_MAX_NEW trailing months
+    key = fingerprint((mode, X))
+    for k in range(0, min(REGIME_WARM_START_MAX_NEW, len(X) - MIN_OBS) + 1):
+        entry = _load_fit(key if k == 0 else fingerprint((mode, X.iloc[:-k])))
+        if entry is not None:
+            return key, entry, k
+    return key, None, 0
+
+
+def _in_sample(X: pd.DataFrame) -> pd.DataFrame:
+    key, entry, behind = _cached_fit(X, "in_sample")
+    if entry is None or behind:
+        entry = {"model": _fit(X.values, copy.deepcopy(entry["model"]) if entry else None)}
+        _save_fit(key, entry)
+    return pd.DataFrame(_labelled_probs(entry["model"], X.values), index=X.index, columns=REGIME_LABELS)
+
+
+def _expanding(X: pd.DataFrame) -> pd.DataFrame:
+    # Month t is labelled by a model fitted on months <= t only, each fit resuming from the previous month's.
+    key, entry, behind = _cached_fit(X, "expanding")
+    if entry is not None and not behind:
+        return entry["path"]
+    first = len(X) - behind + 1 if entry else MIN_OBS
+    gm = copy.deepcopy(entry["model"]) if entry else None
+    rows = []
+    for t in range(first, len(X) + 1):
+        gm = _fit(X.values[:t], gm)
+        rows.append(_labelled_probs(gm, X.values[:t])[-1])
+    path = pd.DataFrame(rows, index=X.index[first - 1 :], columns=REGIME_LABELS)
+    path = pd.concat([entry["path"], path]) if entry else path
+    _save_fit(key, {"model": gm, "path": path})
+    return path
+
+
+def infer_regime(feature_df: pd.DataFrame, out_of_sample: bool = False) -> tuple[pd.DataFrame, pd.Series]:
+    # `out_of_sample=True` gives the expanding-window history (no look-ahead) instead of one full-sample fit
     X = feature_df.dropna().copy()
-    if len(X) < 36:
-        probs = pd.DataFrame(index=feature_df.index, data=np.nan, columns=["Goldilocks", "Reflation", "Slowdown", "Stagflation"])
+    if len(X) < MIN_OBS:
+        probs = pd.DataFrame(index=feature_df.index, data=np.nan, columns=REGIME_LABELS)
         state = pd.Series(index=feature_df.index, data="Insufficient data")
         return probs, state
-    gm = GaussianMixture(n_components=4, random_state=7)
-    gm.fit(X.values)
-    p = gm.predict_proba(X.values)
-    p = np.clip(p, 0.02, 0.94)
-    p = p / p.sum(axis=1, keepdims=True)
-    probs_raw = pd.DataFrame(p, index=X.index, columns=[f"S{i}" for i in range(4)])
-    growth = X.iloc[:, 0].rank(pct=True)
-    infl = X.iloc[:, 1].rank(pct=True)
-    labels = {}
-    for c in probs_raw.columns:
-        idx = probs_raw[c].idxmax()
-        gh, ih = growth.loc[idx] >= 0.5, infl.loc[idx] >= 0.5
-        labels[c] = "Reflation" if gh and ih else "Goldilocks" if gh else "Stagflation" if ih else "Slowdown"
-    probs = probs_raw.rename(columns=labels).groupby(level=0, axis=1).sum().reindex(columns=["Goldilocks", "Reflation", "Slowdown", "Stagflation"], fill_value=0)
+    probs = _expanding(X) if out_of_sample else _in_sample(X)
     probs = probs.ewm(span=3, adjust=False).mean()
     probs = probs / probs.sum(axis=1).values.reshape(-1, 1)
     state = probs.idxmax(axis=1)
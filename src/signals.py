@@ -1,23 +1,36 @@
 from __future__ import annotations
+import numpy as np
 import pandas as pd
+from src.drawdown import duration_days
 from src.utils import pct_rank
 
+SIGNAL_FIELDS = ["mom_3m", "mom_6m", "mom_12m", "vol_12m", "drawdown", "dd_days", "mdd_36m", "mom_pct", "vol_pct", "dd_pct"]
 
-def build_signals(features: dict[str, pd.DataFrame]) -> pd.DataFrame:
+
+def build_signal_panels(features: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    # All signals as (date x ticker) panels; compounded momentum is a rolling sum of log-returns.
     mret = features["monthly_ret"]
-    vol = features["monthly_vol_12m"]
-    dd = features["drawdown"].resample("M").last()
-    out = []
-    for t in mret.columns:
-        s = pd.DataFrame(index=mret.index)
-        s["ticker"] = t
-        s["mom_3m"] = (1 + mret[t]).rolling(3).apply(lambda x: x.prod() - 1)
-        s["mom_6m"] = (1 + mret[t]).rolling(6).apply(lambda x: x.prod() - 1)
-        s["mom_12m"] = (1 + mret[t]).rolling(12).apply(lambda x: x.prod() - 1)
-        s["vol_12m"] = vol[t]
-        s["drawdown"] = dd[t]
-        s["mom_pct"] = pct_rank(s["mom_12m"])
-        s["vol_pct"] = pct_rank(s["vol_12m"])
-        s["dd_pct"] = pct_rank(s["drawdown"])
-        out.append(s)
-    return pd.concat(out).reset_index(names="date")
+    log_ret = np.log1p(mret)
+    panels = {f"mom_{k}m": np.expm1(log_ret.rolling(k).sum()) for k in (3, 6, 12)}
+    panels["vol_12m"] = features["monthly_vol_12m"].reindex(index=mret.index, columns=mret.columns)
+    # drawdown and rolling MDD come from the feature bundle; only the days-underwater panel is computed here
+    dd = features["drawdown"]
+    for k, v in [("drawdown", dd), ("dd_days", duration_days(dd)), ("mdd_36m", features["rolling_mdd_36m"])]:
+        panels[k] = v.resample("M").last().reindex(index=mret.index, columns=mret.columns)
+    panels["mom_pct"] = pct_rank(panels["mom_12m"])
+    panels["vol_pct"] = pct_rank(panels["vol_12m"])
+    panels["dd_pct"] = pct_rank(panels["drawdown"])
+    return panels
+
+
+def signals_long(panels: dict[str, pd.DataFrame], dates: pd.Index | list | None = None) -> pd.DataFrame:
+    idx = panels["mom_12m"].index if dates is None else pd.DatetimeIndex(dates)
+    cols = panels["mom_12m"].columns
+    out = pd.DataFrame({"date": np.tile(idx.values, len(cols)), "ticker": np.repeat(cols.values, len(idx))})
+    for k in SIGNAL_FIELDS:
+        out[k] = panels[k].reindex(index=idx, columns=cols).to_numpy(dtype=float).T.ravel()
+    return out
+
+
+def build_signals(features: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    return signals_long(build_signal_panels(features))
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+
+from src.config import SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_MAX_AGE_HOURS
+from src.features import FeatureBundle
+
+FORMAT_VERSION = 1
+INDEX_COL = "__index__"
+
+
+@dataclass
+class Snapshot:
+    path: Path
+    created: pd.Timestamp
+    params: dict
+    outputs: dict[str, tuple[str, Any]] = field(default_factory=dict)  # node -> (pipeline key, value)
+
+    def age_hours(self) -> float:
+        return (pd.Timestamp.utcnow().tz_localize(None) - self.created).total_seconds() / 3600
+
+
+def snapshot_root(root: str | Path | None = None) -> Path:
+    return Path(root or os.environ.get("CAM_SNAPSHOT_DIR", SNAPSHOT_DIR))
+
+
+def _write_frame(df: pd.DataFrame, path: Path) -> dict:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    labels = [str(c) for c in df.columns]
+    flat = df.copy()
+    flat.columns = labels
+    levels = [f"{INDEX_COL}{i}" for i in range(df.index.nlevels)] if isinstance(df.index, pd.MultiIndex) else [INDEX_COL]
+    for i, name in enumerate(levels):
+        flat.insert(i, name, df.index.get_level_values(i) if len(levels) > 1 else df.index)
+    # uncompressed Arrow IPC so readers can memory-map the file instead of parsing it
+    feather.write_feather(pa.Table.from_pandas(flat.reset_index(drop=True), preserve_index=False), path, compression="uncompressed")
+    spec = {"kind": "frame", "file": path.name, "columns": labels, "index_name": df.index.name}
+    if len(levels) > 1:
+        spec["index_levels"], spec["index_names"] = levels, list(df.index.names)
+    if isinstance(df.columns, pd.MultiIndex):
+        spec["column_tuples"], spec["column_names"] = [list(c) for c in df.columns], list(df.columns.names)
+    return spec
+
+
+def _read_frame(spec: dict, folder: Path) -> pd.DataFrame:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+
+    with pa.memory_map(str(folder / spec["file"]), "r") as source:
+        flat = ipc.open_file(source).read_all().to_pandas()
+    index = spec.get("index_levels", INDEX_COL)
+    out = flat.set_index(index)[spec["columns"]] if spec["columns"] else flat.set_index(index)
+    if "index_levels" in spec:
+        out.index.names = spec["index_names"]
+    else:
+        out.index.name = spec.get("index_name")
+    if "column_tuples" in spec:
+        out.columns = pd.MultiIndex.from_tuples([tuple(c) for c in spec["column_tuples"]], names=spec["column_names"])
+    return out
+
+
+def _dump(value: Any, folder: Path, stem: str) -> dict:
+    if isinstance(value, FeatureBundle):
+        # only the prices; derived features are recomputed lazily on access
+        return {"kind": "features", "dtype": value.dtype.str, "px": _dump(value.px, folder, f"{stem}.px")}
+    if isinstance(value, pd.DataFrame):
+        return _write_frame(value, folder / f"{stem}.arrow")
+    if isinstance(value, pd.Series):
+        spec = _write_frame(value.to_frame("value"), folder / f"{stem}.arrow")
+        return {**spec, "kind": "series", "name": value.name}
+    if isinstance(value, dict) and _has_pandas(value):
+        return {"kind": "dict", "items": {str(k): _dump(v, folder, f"{stem}.{i}") for i, (k, v) in enumerate(value.items())}}
+    if isinstance(value, (tuple, list)) and _has_pandas(value):
+        return {"kind": type(value).__name__, "items": [_dump(v, folder, f"{stem}.{i}") for i, v in enumerate(value)]}
+    return {"kind": "json", "value": json.loads(json.dumps(value, default=str))}
+
+
+def _has_pandas(value: Any) -> bool:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return True
+    if isinstance(value, dict):
+        return any(_has_pandas(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return any(_has_pandas(v) for v in value)
+    return False
+
+
+def _load(spec: dict, folder: Path) -> Any:
+    kind = spec["kind"]
+    if kind == "frame":
+        return _read_frame(spec, folder)
+    if kind == "series":
+        return _read_frame(spec, folder)["value"].rename(spec.get("name"))
+    if kind == "features":
+        return FeatureBundle(_load(spec["px"], folder), spec["dtype"])
+    if kind == "dict":
+        return {k: _load(v, folder) for k, v in spec["items"].items()}
+    if kind in {"tuple", "list"}:
+        items = [_load(v, folder) for v in spec["items"]]
+        return tuple(items) if kind == "tuple" else items
+    return spec["value"]
+
+
+def write_snapshot(pipe, nodes: list[str] | None = None, root: str | Path | None = None, keep: int = SNAPSHOT_KEEP) -> Path:
+    # Evaluate `nodes` (default: all) and write them, with their pipeline keys, to a new versioned folder.
+    root = snapshot_root(root)
+    created = pd.Timestamp.utcnow().tz_localize(None)
+    folder = root / created.strftime("%Y%m%dT%H%M%SZ")
+    tmp = root / f".{folder.name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    manifest = {
+        "format": FORMAT_VERSION, "created": created.isoformat(),
+        "params": {k: v for k, (_, v) in pipe.params.items()}, "nodes": {},
+    }
+    for name in nodes or list(pipe.nodes):
+        manifest["nodes"][name] = {"key": pipe.key(name), "value": _dump(pipe.get(name), tmp, name)}
+    (tmp / "manifest.json").write_text(json.dumps(manifest, default=str), encoding="utf-8")
+    os.replace(tmp, folder)
+    (root / "LATEST.tmp").write_text(folder.name, encoding="utf-8")
+    os.replace(root / "LATEST.tmp", root / "LATEST")
+    for old in sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith("."))[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    return folder
+
+
+def load_latest_snapshot(root: str | Path | None = None, max_age_hours: float | None = SNAPSHOT_MAX_AGE_HOURS) -> Snapshot | None:
+    # Latest complete snapshot, or None if missing, unreadable, from another format or older than `max_age_hours`.
+    root = snapshot_root(root)
+    try:
+        folder = root / (root / "LATEST").read_text(encoding="utf-8").strip()
+        manifest = json.loads((folder / "manifest.json").read_text(encoding="utf-8"))
+        if manifest.get("format") != FORMAT_VERSION:
+            return None
+        snap = Snapshot(folder, pd.Timestamp(manifest["created"]), manifest["params"])
+        if max_age_hours is not None and snap.age_hours() > max_age_hours:
+            return None
+        snap.outputs = {name: (node["key"], _load(node["value"], folder)) for name, node in manifest["nodes"].items()}
+        return snap
+    except Exception:
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    from src.monitor import build_pipeline, default_params
+
+    parser = argparse.ArgumentParser(description="Run the monitor pipeline headless and write a snapshot for the app.")
+    parser.add_argument("--out", default=None, help=f"snapshot root (default: $CAM_SNAPSHOT_DIR or {SNAPSHOT_DIR})")
+    parser.add_argument("--keep", type=int, default=SNAPSHOT_KEEP, help="number of snapshot versions to keep")
+    args = parser.parse_args(argv)
+
+    pipe = build_pipeline()
+    pipe.set_params(**default_params())
+    if pipe["prices"].empty:
+        print("No market prices loaded; snapshot not written.", file=sys.stderr)
+        return 1
+    folder = write_snapshot(pipe, root=args.out, keep=args.keep)
+    print(f"Snapshot written to {folder}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import ast
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from src.config import DEFERRED_IMPORTS, IMPORT_BASELINE, IMPORT_BUDGET_MS, IMPORT_TOTAL_BUDGET_MS
+
+ROOT = Path(__file__).resolve().parents[1]
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def app_imports(path: Path = ROOT / "app.py") -> list[str]:
+    # modules app.py imports at top level, read without running the script; budgeted ones first so each is
+    # charged for everything it pulls in
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    found = [n.module for n in tree.body if isinstance(n, ast.ImportFrom) and n.module and n.module != "__future__"]
+    found += [a.name for n in tree.body if isinstance(n, ast.Import) for a in n.names]
+    return list(dict.fromkeys([*IMPORT_BUDGET_MS, *found]))
+
+
+def import_time_report(modules: list[str] | None = None, baseline: list[str] | None = None, repeats: int = 3) -> pd.DataFrame:
+    # Per-module import cost from `python -X importtime` in fresh interpreters (best of `repeats`), by default
+    # of everything app.py imports. Baseline modules are imported first so the others are charged only for
+    # what they add.
+    modules = modules or app_imports()
+    baseline = IMPORT_BASELINE if baseline is None else baseline
+    code = "".join(f"import {m}\n" for m in [*baseline, *modules])
+    rows = []
+    for run in range(max(1, repeats)):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        for line in proc.stderr.splitlines():
+            m = _LINE.match(line)
+            if m:
+                rows.append({"run": run, "module": m.group(4), "self_ms": int(m.group(1)) / 1000, "cumulative_ms": int(m.group(2)) / 1000, "depth": len(m.group(3)) // 2})
+    if not rows:
+        return pd.DataFrame(columns=["module", "self_ms", "cumulative_ms", "depth"])
+    df = pd.DataFrame(rows)
+    return df.groupby("module", as_index=False).agg(self_ms=("self_ms", "min"), cumulative_ms=("cumulative_ms", "min"), depth=("depth", "min")).sort_values("cumulative_ms", ascending=False, ignore_index=True)
+
+
+def check_startup_budget(report: pd.DataFrame, budgets: dict[str, float] | None = None, deferred: list[str] | None = None, total_budget: float = IMPORT_TOTAL_BUDGET_MS) -> list[str]:
+    budgets = IMPORT_BUDGET_MS if budgets is None else budgets
+    deferred = DEFERRED_IMPORTS if deferred is None else deferred
+    cum = report.set_index("module")["cumulative_ms"]
+    top = report[(report["depth"] == 0) & ~report["module"].str.split(".").str[0].isin(IMPORT_BASELINE)]
+    problems = [f"total: {top['cumulative_ms'].sum():.1f} ms > budget {total_budget:.0f} ms"] if top["cumulative_ms"].sum() > total_budget else []
+    problems += [f"{m}: {cum[m]:.1f} ms > budget {b:.0f} ms" for m, b in budgets.items() if m in cum.index and cum[m] > b]
+    problems += [f"{m}: not imported" for m in budgets if m not in cum.index]
+    problems += [f"{m}: imported at startup but should load on first use" for m in deferred if m in cum.index]
+    return problems
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Report import time of the app's modules and check the startup budget.")
+    parser.add_argument("--top", type=int, default=25, help="rows of the per-module breakdown to print")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    report = import_time_report(repeats=args.repeats)
+    added = report[~report["module"].str.split(".").str[0].isin(IMPORT_BASELINE)]
+    print(f"Import cost on top of baseline ({', '.join(IMPORT_BASELINE)}):")
+    print(added.head(args.top).to_string(index=False))
+    problems = check_startup_budget(report)
+    for p in problems:
+        print(f"BUDGET: {p}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,13 +12,15 @@ def render_how_we_compute() -> None:
 - Monthly return: last business day of month and same formula.
 - Rolling volatility (annualized): \(\sigma_{12m} = std(r_{m,t-11:t})\sqrt{12}\)
 - Drawdown: \(DD_t = P_t / max(P_{0:t}) - 1\)
+- Rolling max drawdown (36m): \(min(DD_{t-755:t})\); drawdown duration: calendar days since the last high.
+- Episode: from a high, through the trough, to the first close back at that high (recovery); days to recovery = recovery - trough.
 
 ### Macro transforms
 - YoY: \(x_t/x_{t-12}-1\)
 - MoM: \(x_t/x_{t-1}-1\)
 - Rolling z-score: \((x_t-\mu_w)/\sigma_w\)
 - Winsorization: cap tails at 1st/99th percentile.
-- Frequency alignment: all series displayed on daily axis with forward fill from native frequency.
+- Frequency alignment: series and composites are stored at native frequency; charts put them on a daily axis with forward fill.
 
 ### Composites
 - For each country and bucket we compute weighted sum:
@@ -32,6 +34,12 @@ def render_how_we_compute() -> None:
 - Score: \(s_r = -((g-c_x)^2+(\pi-c_y)^2)/(2\sigma^2)\)
 - Probability via softmax over 4 scores.
 
+### Allocation backtest
+- Each month-end the recommended weights are recomputed from the trailing 120 months (Ledoit-Wolf shrunk variances, mean blended with the last 12 months) and the out-of-sample regime probabilities and stress known at that date (macro drivers only forward-filled, never interpolated), then held for the next month.
+- Benchmark: 60% SPY / 40% IEF, rebalanced monthly.
+- Turnover: \(\tfrac12\sum_i |w_{i,t} - \tilde w_{i,t}|\), where \(\tilde w\) are last month's weights after drifting with returns.
+- Forward risk: 20,000 paths of 12 months resampled from history in 3-month blocks; each block starts in a month of the path's current regime (first block drawn from today's regime probabilities). VaR is the 5%/1% quantile of the 12-month return, CVaR the mean beyond it.
+
 ### Example
 If growth_z=0.8 and infl_z=-0.6, distance to Goldilocks center is smallest, so Goldilocks probability is highest.
 """
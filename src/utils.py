@@ -1,4 +1,5 @@
 from __future__ import annotations
+import hashlib
 import pandas as pd
 import numpy as np
 
@@ -7,8 +8,15 @@ def to_monthly_last(df: pd.DataFrame) -> pd.DataFrame:
     return df.resample("M").last().dropna(how="all")
 
 
-def pct_rank(s: pd.Series, window: int = 120) -> pd.Series:
-    return s.rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False).clip(0, 100)
+def pct_rank(s: pd.Series | pd.DataFrame, window: int = 120, expanding: bool = False, min_periods: int | None = None) -> pd.Series | pd.DataFrame:
+    # Percentile (0-100) of the latest value within its trailing window, computed column-wise in one
+    # call via pandas' windowed rank kernel (average ties, NaN unless `min_periods` valid obs).
+    # `expanding=True` ranks against all history up to each date, so there is no look-ahead either way.
+    min_periods = window if min_periods is None else min_periods
+    # empty fetches leave object columns (NaN / pd.NA) that window ops reject
+    s = s.apply(pd.to_numeric, errors="coerce").astype(float) if isinstance(s, pd.DataFrame) else pd.to_numeric(s, errors="coerce").astype(float)
+    roll = s.expanding(min_periods=min_periods) if expanding else s.rolling(window, min_periods=min_periods)
+    return (roll.rank(method="average", pct=True) * 100).clip(0, 100)
 
 
 def safe_div(a: pd.Series, b: pd.Series) -> pd.Series:
@@ -28,3 +36,32 @@ def non_nan(df: pd.DataFrame) -> pd.DataFrame:
 
 def annualized_vol(ret: pd.Series, window: int = 12) -> pd.Series:
     return ret.rolling(window).std() * np.sqrt(12)
+
+
+def fingerprint(obj) -> str:
+    # Stable content hash for cache keys: pandas objects hash values + index + labels, containers recurse.
+    h = hashlib.sha1()
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        h.update(repr(obj.columns.tolist() if isinstance(obj, pd.DataFrame) else obj.name).encode())
+        try:
+            h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        except TypeError:
+            h.update(obj.to_csv().encode())
+    elif isinstance(obj, pd.Index):
+        h.update(pd.util.hash_pandas_object(obj).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.dtype.str, obj.shape)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"dict")
+        for k in sorted(obj, key=repr):
+            h.update(repr(k).encode())
+            h.update(fingerprint(obj[k]).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(type(obj).__name__.encode())
+        for v in obj:
+            h.update(fingerprint(v).encode())
+    else:
+        h.update(repr(obj).encode())
+    return h.hexdigest()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# run from anywhere: the tests import the app's `src` package from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import src.features as features
+from src.bench import synthetic_prices
+from src.features import build_market_features, incremental_features
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    # fresh engine cache, counting full (re)builds
+    builds = []
+    monkeypatch.setattr(features, "_ENGINES", features.OrderedDict())
+    init = features.MarketFeatureEngine.__init__
+    monkeypatch.setattr(features.MarketFeatureEngine, "__init__", lambda self, px: (builds.append(len(px)), init(self, px))[1])
+    return builds
+
+
+def test_sessions_with_different_end_dates_share_the_engine(engines):
+    px = synthetic_prices(n_tickers=8, years=6, seed=1)
+    early, late = px.iloc[:-40], px
+    for _ in range(3):
+        for view in [early, late]:
+            out = incremental_features(view)
+            np.testing.assert_allclose(out["vol_3m"].to_numpy(), build_market_features(view)["vol_3m"].to_numpy(), rtol=1e-9)
+    assert engines == [len(early)]
+
+
+def test_returned_frames_do_not_alias_the_engine(engines):
+    px = synthetic_prices(n_tickers=8, years=6, seed=1)
+    out = incremental_features(px.iloc[:-5], np.float32)
+    before = out["drawdown"].copy()
+    incremental_features(px.iloc[:-5])
+    out_late = incremental_features(px)
+    out_late["drawdown"].iloc[:] = 0.0
+    assert out["drawdown"].dtypes.eq(np.float32).all()
+    np.testing.assert_array_equal(out["drawdown"].to_numpy(), before.to_numpy())
+    np.testing.assert_array_equal(incremental_features(px.iloc[:-5], np.float32)["drawdown"].to_numpy(), before.to_numpy())
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.covariance import LedoitWolf
+
+from src.bench import synthetic_prices
+from src.config import BENCH_ENGINE_MAX_DRIFT
+from src.drawdown import analyze_drawdowns, rolling_min
+from src.features import MarketFeatureEngine, build_market_features, engine_drift
+from src.portfolio import allocation_grid, recommend_weights, regime_scenarios, rolling_moments
+from src.utils import pct_rank, to_monthly_last
+
+# Every fast kernel against the straightforward implementation it replaced, on the bench's synthetic data.
+
+
+@pytest.fixture(scope="module")
+def px() -> pd.DataFrame:
+    return synthetic_prices(n_tickers=12, years=12, seed=3)
+
+
+@pytest.fixture(scope="module")
+def monthly_ret(px) -> pd.DataFrame:
+    return to_monthly_last(px).pct_change(fill_method=None)
+
+
+def test_pct_rank_matches_rolling_apply(monthly_ret):
+    ref = monthly_ret.rolling(60).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1] * 100, raw=False).clip(0, 100)
+    np.testing.assert_allclose(pct_rank(monthly_ret, 60).to_numpy(), ref.to_numpy(), rtol=1e-12)
+
+
+def test_rolling_moments_match_ledoit_wolf(monthly_ret):
+    R = monthly_ret.dropna(how="any").to_numpy(dtype=float)
+    window = 36
+    m, mean12, risk = rolling_moments(R, window)
+    for t in range(window - 1, len(R), 7):
+        x = R[t - window + 1 : t + 1]
+        np.testing.assert_allclose(m[t], x.mean(axis=0), rtol=1e-9)
+        np.testing.assert_allclose(mean12[t], x[-12:].mean(axis=0), rtol=1e-9)
+        np.testing.assert_allclose(risk[t], np.diag(LedoitWolf().fit(x).covariance_), rtol=1e-6)
+
+
+def test_rolling_min_matches_pandas(px):
+    for window in [1, 5, 63]:
+        np.testing.assert_allclose(rolling_min(px, window).to_numpy(), px.rolling(window).min().to_numpy())
+
+
+def test_analyze_drawdowns_matches_reference(px):
+    dd = analyze_drawdowns(px, window=252)
+    ref = px / px.cummax() - 1
+    np.testing.assert_allclose(dd.drawdown.to_numpy(), ref.to_numpy())
+    np.testing.assert_allclose(dd.rolling_mdd.to_numpy(), ref.rolling(252).min().to_numpy())
+    # duration is 0 at every high, and episodes cover exactly the underwater tickers
+    assert (dd.duration_days.to_numpy()[ref.to_numpy() == 0] == 0).all()
+    assert set(dd.episodes["ticker"]) == set(ref.columns[(ref < 0).any()])
+    np.testing.assert_allclose(dd.episodes.groupby("ticker")["depth"].min().sort_index(), ref.min()[(ref < 0).any()].sort_index())
+
+
+def test_feature_engine_matches_full_recompute(px):
+    engine = MarketFeatureEngine(px.iloc[:-60])
+    for chunk in np.array_split(np.arange(len(px) - 60, len(px)), 3):
+        inc = engine.update(px.iloc[chunk])
+    full = build_market_features(px)
+    assert list(inc) == list(full)
+    for k, ref in full.items():
+        np.testing.assert_allclose(inc[k].to_numpy(), ref.to_numpy(), rtol=1e-9, atol=1e-12, err_msg=k)
+
+
+def test_engine_drift_is_zero(px):
+    drift = engine_drift(px)
+    assert np.isfinite(drift).all()
+    np.testing.assert_allclose(drift.to_numpy(), 0.0, atol=BENCH_ENGINE_MAX_DRIFT)
+
+
+def test_allocation_grid_matches_recommend_weights(monthly_ret):
+    scenarios = regime_scenarios()
+    grid = allocation_grid(monthly_ret, scenarios, stress=0.7, flex_grid=[0.0, 0.1, 0.2])
+    for (profile, flex, scenario), row in grid.iterrows():
+        ref = recommend_weights(monthly_ret, profile, scenarios.loc[scenario], 0.7, flex).set_index("ticker")["weight"]
+        np.testing.assert_allclose(row.to_numpy(), ref.reindex(grid.columns).to_numpy(), rtol=1e-12, atol=1e-15)
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+import src.plots as plots
+from src.bench import synthetic_prices
+from src.plots import line
+
+
+def test_cached_figures_are_private_copies():
+    px = synthetic_prices(n_tickers=4, years=2, seed=5)
+    first = line(px, "Prices", key="test-copies")
+    first.update_layout(title="changed")
+    again = line(px, "Prices", key="test-copies")
+    assert again is not first and again.layout.title.text == "Prices"
+    again.data[0].name = "changed"
+    assert line(px, "Prices", key="test-copies").data[0].name == px.columns[0]
+
+
+def test_keyed_lookup_does_not_hash_frames(monkeypatch):
+    px = synthetic_prices(n_tickers=4, years=2, seed=6)
+    line(px, "Prices", key="test-keyed")
+    hashed = []
+    fingerprint = plots.fingerprint
+    monkeypatch.setattr(plots, "fingerprint", lambda obj: (hashed.append(obj), fingerprint(obj))[1])
+    line(px, "Prices", key="test-keyed")
+    assert hashed and not any(plots._is_frame(a) for call in hashed for a in call[2])
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from src.config import DEFERRED_IMPORTS, IMPORT_BUDGET_MS
+from src.startup import app_imports, check_startup_budget, import_time_report
+
+
+def test_app_imports_cover_budgeted_modules():
+    mods = app_imports()
+    assert set(IMPORT_BUDGET_MS) <= set(mods)
+    assert "src.monitor" in mods and "__future__" not in mods
+
+
+def test_app_import_time_within_budget():
+    # `python -X importtime` over everything app.py imports: total, per-module and deferred-import budgets
+    report = import_time_report(app_imports())
+    assert not report.empty
+    assert check_startup_budget(report) == []
+
+
+def test_budget_check_flags_overruns():
+    report = import_time_report(["src.config"], repeats=1)
+    problems = check_startup_budget(report, budgets={"src.config": 0.0}, deferred=[], total_budget=0.0)
+    assert any(p.startswith("total:") for p in problems)
+    assert any(p.startswith("src.config:") for p in problems)
+    assert not any(m in set(report["module"]) for m in DEFERRED_IMPORTS)
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import pandas as pd
+import pytest
+
+import src.data_sources.store as store
+from src.data_sources.store import cached_series, read_series
+
+
+@pytest.fixture(autouse=True)
+def tmp_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("CAM_SERIES_STORE", str(tmp_path))
+
+
+def _series(start: str, periods: int) -> pd.DataFrame:
+    return pd.DataFrame({"value": range(periods)}, index=pd.date_range(start, periods=periods, freq="MS"), dtype=float)
+
+
+def test_failed_tail_fetch_keeps_last_fetch(monkeypatch):
+    cached_series("TEST", "s", "2000-01-01", None, lambda s, e: _series("2000-01-01", 24))
+    before = read_series("TEST", "s")[1]["last_fetch"]
+    monkeypatch.setattr(store, "_now", lambda: pd.Timestamp(before) + pd.Timedelta(days=2))
+    calls = []
+
+    def down(s, e):
+        calls.append(s)
+        raise RuntimeError("provider down")
+
+    for fetch in [down, lambda s, e: pd.DataFrame(columns=["value"])]:
+        out = cached_series("TEST", "s", "2000-01-01", None, fetch)
+        assert len(out) == 24 and read_series("TEST", "s")[1]["last_fetch"] == before
+    cached_series("TEST", "s", "2000-01-01", None, down)
+    assert len(calls) == 2
+
+
+def test_eurostat_callers_share_one_full_history(monkeypatch):
+    from src import data_extra
+    from src.data_sources import eurostat_client
+
+    pulls = []
+    monkeypatch.setattr(data_extra, "_download_eurostat", lambda series_id: (pulls.append(series_id), _series("1995-01-01", 360))[1])
+    monkeypatch.setattr(eurostat_client, "_download", lambda url: (pulls.append(url), _series("1995-01-01", 360))[1])
+    out = data_extra._fetch_eurostat("une_rt_m", "2010-01-01", "2010-12-31")
+    assert out.index.min() == pd.Timestamp("2010-01-01") and out.index.max() == pd.Timestamp("2010-12-01")
+    assert len(eurostat_client.fetch_eurostat_series.__wrapped__("une_rt_m")) == 360
+    data_extra._fetch_eurostat("une_rt_m", "2005-01-01", None)
+    assert len(pulls) == 1